@@ -0,0 +1,224 @@
+"""
+Daily task rollups for TaskFlow analytics
+
+``task_daily_stats`` holds one document per (user_id, day) with the number
+of tasks created and completed that day (UTC). TaskService keeps it
+current with ``$inc`` upserts on create, on completion changes and on
+delete, so charts read a few small documents instead of scanning every
+task. Deleted tasks are subtracted again, which keeps the rollups equal
+to what ``rebuild`` (the backfill) computes from the tasks that exist.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+from .resilience import remaining_ms
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = 'task_daily_stats'
+MAX_RANGE_DAYS = 366
+
+
+def day_of(moment: datetime) -> datetime:
+    """Midnight (UTC) of the day ``moment`` falls on"""
+    return datetime(moment.year, moment.month, moment.day)
+
+
+def _day_expression(field: str) -> Dict:
+    """Aggregation equivalent of day_of()"""
+    return {'$dateFromParts': {
+        'year': {'$year': field},
+        'month': {'$month': field},
+        'day': {'$dayOfMonth': field},
+    }}
+
+
+class TaskRollups:
+    """Incremental and rebuilt per-day task counters"""
+
+    @property
+    def collection(self):
+        from .mongodb_service import mongodb_service
+        return mongodb_service.db[COLLECTION]
+
+    # -- incremental updates from TaskService --
+
+    def record_created(self, user_id: str, created_at: datetime, completed_at: Optional[datetime] = None):
+        changes = [(created_at, 'created', 1)]
+        if completed_at:
+            changes.append((completed_at, 'completed', 1))
+        self._inc(user_id, changes)
+
+    def record_completion(self, user_id: str, completed_at: Optional[datetime] = None,
+                          uncompleted: Optional[datetime] = None):
+        """Count a completion at ``completed_at``, or take back one made at ``uncompleted``"""
+        if completed_at:
+            self._inc(user_id, [(completed_at, 'completed', 1)])
+        elif uncompleted:
+            self._inc(user_id, [(uncompleted, 'completed', -1)])
+
+    def record_deleted(self, user_id: str, task: Dict):
+        changes = [(task['created_at'], 'created', -1)]
+        if task.get('completed'):
+            changes.append((task.get('completed_at') or task['updated_at'], 'completed', -1))
+        self._inc(user_id, changes)
+
+    def _inc(self, user_id: str, changes: List):
+        """
+        Apply (moment, counter, delta) changes with one bulk of upserts.
+
+        Failures are logged rather than raised: the task write already
+        succeeded, and drift is repaired by ``manage.py backfill_task_rollups``.
+        """
+        from pymongo import UpdateOne
+        from pymongo.errors import BulkWriteError
+
+        increments = defaultdict(lambda: defaultdict(int))
+        for moment, counter, delta in changes:
+            increments[day_of(moment)][counter] += delta
+        requests = [
+            UpdateOne({'user_id': user_id, 'day': day}, {'$inc': dict(counts)}, upsert=True)
+            for day, counts in increments.items()
+        ]
+        try:
+            self._upsert(requests)
+        except BulkWriteError as e:
+            logger.error(f"Could not update task rollups for user {user_id}: {e.details}")
+        except Exception as e:
+            logger.error(f"Could not update task rollups for user {user_id}: {e}")
+
+    def _upsert(self, requests: List):
+        """Bulk-write upserts, retrying once those that lost a race on the user_day index"""
+        from pymongo.errors import BulkWriteError
+
+        for attempt in range(2):
+            try:
+                self.collection.bulk_write(requests, ordered=False)
+                return
+            except BulkWriteError as e:
+                # Two first writes for the same day raced on the user_day unique
+                # index; the loser's upsert becomes an update on retry
+                if attempt or any(error['code'] != 11000 for error in e.details['writeErrors']):
+                    raise
+                requests = [requests[error['index']] for error in e.details['writeErrors']]
+
+    # -- reads --
+
+    def get_series(self, user_id: str, days: int, group: str = 'day') -> Dict:
+        """
+        Created/completed counts for the last ``days`` days (today included).
+
+        Every period is present, zeros included. With ``group='week'``
+        days are summed into ISO weeks, labelled by their Monday.
+        """
+        if not 1 <= days <= MAX_RANGE_DAYS:
+            raise ValueError(f"range must be between 1 and {MAX_RANGE_DAYS} days")
+        if group not in ('day', 'week'):
+            raise ValueError("group must be 'day' or 'week'")
+
+        today = day_of(datetime.utcnow())
+        since = today - timedelta(days=days - 1)
+        rows = self.collection.aggregate([
+            {'$match': {'user_id': user_id, 'day': {'$gte': since}}},
+            {'$group': {'_id': '$day', 'created': {'$sum': '$created'}, 'completed': {'$sum': '$completed'}}},
+        ], maxTimeMS=remaining_ms())
+        by_day = {row['_id']: row for row in rows}
+
+        periods = {}
+        for offset in range(days):
+            day = since + timedelta(days=offset)
+            period = day - timedelta(days=day.weekday()) if group == 'week' else day
+            counts = periods.setdefault(period, {'created': 0, 'completed': 0})
+            row = by_day.get(day)
+            if row:
+                counts['created'] += row['created']
+                counts['completed'] += row['completed']
+
+        series = [
+            {'period': period.date().isoformat(), **counts}
+            for period, counts in sorted(periods.items())
+        ]
+        return {
+            'range_days': days,
+            'group': group,
+            'series': series,
+            'totals': {
+                'created': sum(p['created'] for p in series),
+                'completed': sum(p['completed'] for p in series),
+            },
+        }
+
+    # -- backfill --
+
+    def rebuild(self, user_id: Optional[str] = None) -> int:
+        """
+        Recompute rollups from the tasks collection with aggregation pipelines.
+
+        Scoped to one user when ``user_id`` is given. Completed tasks from
+        before completed_at was recorded get their updated_at as an
+        estimate, written back so later decrements hit the same day.
+
+        Corrections are applied as ``$inc`` deltas against the rollups read
+        right after the aggregation, so increments from task writes made
+        after that read are kept. A task write landing between the
+        aggregation and the read is still miscounted until the next
+        rebuild. Days left with no tasks are deleted while still at zero.
+        Returns the number of rollup documents corrected.
+        """
+        from pymongo import UpdateOne
+        from .mongodb_service import mongodb_service
+
+        scope = {'user_id': user_id} if user_id else {}
+        tasks = mongodb_service.tasks_collection
+        tasks.update_many(
+            {**scope, 'completed': True, 'completed_at': None},
+            [{'$set': {'completed_at': '$updated_at'}}],
+        )
+
+        counts = defaultdict(lambda: {'created': 0, 'completed': 0})
+        for counter, match, field in (
+            ('created', scope, '$created_at'),
+            ('completed', {**scope, 'completed': True}, '$completed_at'),
+        ):
+            pipeline = [
+                {'$match': match},
+                {'$group': {
+                    '_id': {'user_id': '$user_id', 'day': _day_expression(field)},
+                    'count': {'$sum': 1},
+                }},
+            ]
+            for row in tasks.aggregate(pipeline, allowDiskUse=True):
+                counts[(row['_id']['user_id'], row['_id']['day'])][counter] = row['count']
+
+        current = {
+            (doc['user_id'], doc['day']): doc
+            for doc in self.collection.find(scope, {'user_id': 1, 'day': 1, 'created': 1, 'completed': 1})
+        }
+        requests = []
+        for user, day in sorted(set(counts) | set(current)):
+            expected = counts.get((user, day), {})
+            stored = current.get((user, day), {})
+            delta = {
+                counter: expected.get(counter, 0) - stored.get(counter, 0)
+                for counter in ('created', 'completed')
+            }
+            delta = {counter: value for counter, value in delta.items() if value}
+            if delta:
+                requests.append(UpdateOne({'user_id': user, 'day': day}, {'$inc': delta}, upsert=True))
+        for start in range(0, len(requests), 1000):
+            self._upsert(requests[start:start + 1000])
+
+        # Only while still empty: a task created meanwhile keeps its day
+        empty = [doc['_id'] for key, doc in current.items() if key not in counts]
+        for start in range(0, len(empty), 1000):
+            self.collection.delete_many({
+                '_id': {'$in': empty[start:start + 1000]},
+                'created': {'$in': [0, None]},
+                'completed': {'$in': [0, None]},
+            })
+        return len(requests)
+
+task_rollups = TaskRollups()
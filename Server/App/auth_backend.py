@@ -5,6 +5,7 @@ Custom Authentication Backend for MongoDB
 from django.contrib.auth.backends import BaseBackend
 from django.contrib.auth.models import AnonymousUser
 from .user_service import user_service
+from .resilience import DatabaseUnavailable
 
 class MongoDBUser:
     """Custom user class for MongoDB users"""
@@ -42,6 +43,8 @@ class MongoDBAuthBackend(BaseBackend):
             user_data = user_service.get_user_by_id(user_id)
             if user_data:
                 return MongoDBUser(user_data)
+        except DatabaseUnavailable:
+            raise
         except Exception:
             pass
         return None
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+Idempotency-Key support for TaskFlow write endpoints
+
+A client that retries a POST with the same ``Idempotency-Key`` header gets
+the original response back instead of a second write. Keys are scoped per
+user and stored in the ``idempotency_keys`` collection with ``_id`` set to
+``<user_id>:<key>``, so the always-present unique _id index decides which
+of several concurrent duplicates runs the request; the others wait for it
+and replay its response. Records expire through a TTL index.
+
+The record also reserves the ObjectId of the resource the request creates
+(``request.idempotent_object_id``), so a retry after a crash that happened
+between the insert and the response still cannot insert a duplicate.
+"""
+
+import functools
+import hashlib
+import json
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from bson import ObjectId
+from django.conf import settings
+from rest_framework import status
+from rest_framework.response import Response
+
+from .mongodb_service import mongodb_service
+from .resilience import guarded, remaining_ms
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'TTL_SECONDS': 24 * 3600,  # how long a key can be replayed
+    'PENDING_TIMEOUT': 30,     # after this, an unfinished request's key can be taken over
+    'WAIT_SECONDS': 5,         # how long a duplicate waits for the original to finish
+    'POLL_INTERVAL': 0.05,
+}
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def get_config(key):
+    """Read an IDEMPOTENCY_KEYS setting, falling back to DEFAULTS"""
+    return getattr(settings, 'IDEMPOTENCY_KEYS', {}).get(key, DEFAULTS[key])
+
+
+def request_fingerprint(request) -> str:
+    """Hash of what the request asks for, to detect a key reused for a different request"""
+    data = request.data.dict() if hasattr(request.data, 'dict') else request.data
+    payload = json.dumps(
+        {'method': request.method, 'path': request.path, 'data': data},
+        sort_keys=True, default=str,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class IdempotencyStore:
+    """Reservation and stored responses for idempotency keys"""
+
+    @property
+    def collection(self):
+        return mongodb_service.db.idempotency_keys
+
+    @guarded('idempotency.reserve')
+    def reserve(self, user_id: str, key: str, fingerprint: str) -> Optional[Dict]:
+        """
+        Claim the key for this request.
+
+        Returns the new record, or None if another request holds the key
+        (see ``existing``). A pending record older than PENDING_TIMEOUT is
+        taken over, keeping its reserved object id.
+        """
+        from pymongo import ReturnDocument
+        from pymongo.errors import DuplicateKeyError
+
+        now = datetime.utcnow()
+        record = {
+            '_id': f"{user_id}:{key}",
+            'user_id': user_id,
+            'key': key,
+            'fingerprint': fingerprint,
+            'object_id': ObjectId(),
+            'state': 'pending',
+            'locked_at': now,
+            'created_at': now,
+        }
+        try:
+            self.collection.insert_one(record)
+            return record
+        except DuplicateKeyError:
+            pass
+
+        return self.collection.find_one_and_update(
+            {
+                '_id': record['_id'],
+                'fingerprint': fingerprint,
+                'state': 'pending',
+                'locked_at': {'$lt': now - timedelta(seconds=get_config('PENDING_TIMEOUT'))},
+            },
+            {'$set': {'locked_at': now}},
+            return_document=ReturnDocument.AFTER,
+            maxTimeMS=remaining_ms(),
+        )
+
+    @guarded('idempotency.existing', idempotent=True)
+    def existing(self, user_id: str, key: str) -> Optional[Dict]:
+        return self.collection.find_one({'_id': f"{user_id}:{key}"}, max_time_ms=remaining_ms())
+
+    @guarded('idempotency.complete')
+    def complete(self, record: Dict, response: Response):
+        """Store the response to replay for this key"""
+        body = response.data
+        self.collection.update_one(
+            {'_id': record['_id'], 'locked_at': record['locked_at']},
+            {'$set': {
+                'state': 'done',
+                'status_code': response.status_code,
+                'body': body,
+                'body_hash': hashlib.sha256(
+                    json.dumps(body, sort_keys=True, default=str).encode()
+                ).hexdigest(),
+                'completed_at': datetime.utcnow(),
+            }},
+        )
+
+    @guarded('idempotency.release')
+    def release(self, record: Dict):
+        """
+        Unlock a reservation whose request failed so a retry can take it over.
+
+        The record is kept rather than deleted: the failed request may
+        already have inserted its object, and the retry must reuse that id.
+        """
+        self.collection.update_one(
+            {'_id': record['_id'], 'locked_at': record['locked_at'], 'state': 'pending'},
+            {'$set': {'locked_at': datetime(1970, 1, 1)}},
+        )
+
+
+idempotency_store = IdempotencyStore()
+
+
+def _replay(record: Dict) -> Response:
+    return Response(record.get('body'), status=record['status_code'], headers={'Idempotent-Replayed': 'true'})
+
+
+def _error(message: str, code: int, headers: Optional[Dict] = None) -> Response:
+    return Response({'error': message}, status=code, headers=headers)
+
+
+def idempotent(view_method):
+    """
+    Make a view method honour the Idempotency-Key header.
+
+    Requests without the header run normally. Responses below 500 are
+    stored and replayed; after server errors and exceptions the key is
+    released for the client's retry.
+    """
+    @functools.wraps(view_method)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return view_method(self, request, *args, **kwargs)
+        key = key.strip()
+        if not 0 < len(key) <= MAX_KEY_LENGTH:
+            return _error(f'{HEADER} must be 1-{MAX_KEY_LENGTH} characters', status.HTTP_400_BAD_REQUEST)
+
+        user_id = request.user.id
+        fingerprint = request_fingerprint(request)
+        deadline = time.monotonic() + get_config('WAIT_SECONDS')
+        while True:
+            record = idempotency_store.reserve(user_id, key, fingerprint)
+            if record is not None:
+                break
+            current = idempotency_store.existing(user_id, key)
+            if current is None:
+                continue  # expired in between; try to claim it again
+            if current['fingerprint'] != fingerprint:
+                return _error(
+                    f'{HEADER} was already used for a different request',
+                    status.HTTP_422_UNPROCESSABLE_ENTITY,
+                )
+            if current['state'] == 'done':
+                return _replay(current)
+            if time.monotonic() >= deadline:
+                return _error(
+                    'A request with this Idempotency-Key is still in progress',
+                    status.HTTP_409_CONFLICT, headers={'Retry-After': '1'},
+                )
+            time.sleep(get_config('POLL_INTERVAL'))
+
+        request.idempotent_object_id = str(record['object_id'])
+        try:
+            response = view_method(self, request, *args, **kwargs)
+        except Exception:
+            _release_quietly(record)
+            raise
+        if response.status_code >= 500:
+            _release_quietly(record)
+        else:
+            try:
+                idempotency_store.complete(record, response)
+            except Exception as e:
+                # The write happened; a retry re-runs it against the reserved object id
+                logger.error(f"Could not store response for {HEADER} {key}: {e}")
+        return response
+    return wrapper
+
+
+def _release_quietly(record: Dict):
+    try:
+        idempotency_store.release(record)
+    except Exception as e:
+        logger.error(f"Could not release {HEADER} {record['key']}: {e}")
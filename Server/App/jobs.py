@@ -0,0 +1,438 @@
+"""
+Background jobs for TaskFlow
+
+Heavy per-user operations (bulk deletes, imports, exports, recounts) are
+enqueued as documents in the ``jobs`` collection and run by ``manage.py
+run_workers`` instead of inside a request. Workers claim queued jobs
+atomically with ``find_one_and_update`` and hold a lease that a heartbeat
+keeps extending; a job whose worker died or was restarted is reclaimed
+once its lease expires (up to MAX_ATTEMPTS), so nothing queued or running
+is lost. Jobs may therefore run more than once and every job type is
+written to be safe to re-run.
+"""
+
+import logging
+import os
+import socket
+import threading
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import bson
+from bson import ObjectId
+from django.conf import settings
+
+from .analytics import task_rollups
+from .mongodb_service import mongodb_service, task_service, LOOKUP_MAX_IDS
+from .resilience import guarded, remaining_ms
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'LEASE_SECONDS': 60,         # a running job is reclaimed this long after its last heartbeat
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY_SECONDS': 30,   # multiplied by the attempt number
+    'POLL_INTERVAL': 1.0,        # idle wait between claims
+    'WORKERS': 2,
+    'MODE': 'thread',            # 'thread' or 'process'
+    'IMPORT_MAX_TASKS': 5000,
+    'EXPORT_MAX_BYTES': 8 * 1024 * 1024,  # the result is stored in the job document (16MB limit)
+    'RETENTION_SECONDS': 7 * 24 * 3600,  # finished jobs expire (finished_at_ttl index)
+}
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+
+
+def get_config(key):
+    """Read a BACKGROUND_JOBS setting, falling back to DEFAULTS"""
+    return getattr(settings, 'BACKGROUND_JOBS', {}).get(key, DEFAULTS[key])
+
+
+class JobContext:
+    """What a running job sees: its parameters and a progress reporter"""
+
+    def __init__(self, job: Dict, queue: 'JobQueue'):
+        self.id = job['_id']
+        self.user_id = job['user_id']
+        self.params = job.get('params') or {}
+        self._job = job
+        self._queue = queue
+
+    def progress(self, done: int, total: int, message: Optional[str] = None):
+        """Record progress (also renews the lease)"""
+        self._queue.report_progress(self._job, done, total, message)
+
+
+# -- job types --
+
+class BulkDeleteJob:
+    """Delete the listed tasks (``ids``) or all completed ones (``completed: true``)"""
+
+    def validate(self, params: Dict) -> Dict:
+        ids = params.get('ids')
+        if ids is not None:
+            if not isinstance(ids, list) or not all(isinstance(i, str) for i in ids):
+                raise ValueError("ids must be a list of task ids")
+            if len(ids) > LOOKUP_MAX_IDS:
+                raise ValueError(f"At most {LOOKUP_MAX_IDS} ids can be deleted at once")
+            return {'ids': ids}
+        if params.get('completed') is True:
+            return {'completed': True}
+        raise ValueError("Provide ids or completed: true")
+
+    def run(self, job: JobContext) -> Dict:
+        if 'ids' in job.params:
+            task_ids = job.params['ids']
+        else:
+            task_ids = [
+                str(doc['_id']) for doc in
+                task_service.collection.find({'user_id': job.user_id, 'completed': True}, {'_id': 1})
+            ]
+        deleted = 0
+        for done, task_id in enumerate(task_ids, 1):
+            # Already-deleted tasks (e.g. on a re-run) are simply skipped
+            if ObjectId.is_valid(task_id) and task_service.delete_task(task_id, job.user_id):
+                deleted += 1
+            job.progress(done, len(task_ids))
+        return {'deleted': deleted}
+
+
+class ImportJob:
+    """Create tasks from ``tasks: [{title, description, completed, tags, due_at}]``"""
+
+    def validate(self, params: Dict) -> Dict:
+        tasks = params.get('tasks')
+        if not isinstance(tasks, list) or not tasks:
+            raise ValueError("tasks must be a non-empty list")
+        if len(tasks) > get_config('IMPORT_MAX_TASKS'):
+            raise ValueError(f"At most {get_config('IMPORT_MAX_TASKS')} tasks can be imported at once")
+        cleaned = []
+        for item in tasks:
+            if not isinstance(item, dict) or not isinstance(item.get('title'), str) or not item['title'].strip():
+                raise ValueError("Every task needs a title")
+            if not isinstance(item.get('description', ''), str):
+                raise ValueError("description must be a string")
+            if not isinstance(item.get('completed', False), bool):
+                raise ValueError("completed must be true or false")
+            cleaned.append({
+                # Ids are fixed up front so a re-run cannot create duplicates
+                'id': str(ObjectId()),
+                'title': item['title'].strip(),
+                'description': item.get('description', '').strip(),
+                'completed': item.get('completed', False),
+                'tags': item.get('tags', []),
+                'due_at': item.get('due_at'),
+            })
+        return {'tasks': cleaned}
+
+    def run(self, job: JobContext) -> Dict:
+        tasks = job.params['tasks']
+        errors = []
+        for done, item in enumerate(tasks, 1):
+            try:
+                task_service.create_task(
+                    item['title'], item['description'], job.user_id, item['completed'],
+                    item['tags'], item['due_at'], task_id=item['id'],
+                )
+            except ValueError as e:
+                errors.append({'index': done - 1, 'error': str(e)})
+            job.progress(done, len(tasks))
+        return {'imported': len(tasks) - len(errors), 'errors': errors}
+
+
+class ExportJob:
+    """
+    Snapshot the user's tasks into the job result.
+
+    The result lives in the job document, so it stops at EXPORT_MAX_BYTES
+    of BSON; ``truncated`` tells the client the list is incomplete.
+    """
+
+    def validate(self, params: Dict) -> Dict:
+        return {}
+
+    def run(self, job: JobContext) -> Dict:
+        tasks = task_service.get_tasks_by_user(job.user_id)
+        budget = get_config('EXPORT_MAX_BYTES')
+        exported = []
+        for task in tasks:
+            budget -= len(bson.encode(task))
+            if budget < 0:
+                break
+            exported.append(task)
+        job.progress(len(exported), len(tasks))
+        return {
+            'count': len(exported),
+            'total': len(tasks),
+            'truncated': len(exported) < len(tasks),
+            'tasks': exported,
+        }
+
+
+class RecountAnalyticsJob:
+    """Rebuild the user's daily analytics rollups from their tasks"""
+
+    def validate(self, params: Dict) -> Dict:
+        return {}
+
+    def run(self, job: JobContext) -> Dict:
+        days = task_rollups.rebuild(job.user_id)
+        job.progress(1, 1)
+        return {'days': days}
+
+
+JOB_TYPES = {
+    'tasks.bulk_delete': BulkDeleteJob,
+    'tasks.import': ImportJob,
+    'tasks.export': ExportJob,
+    'tasks.recount_analytics': RecountAnalyticsJob,
+}
+
+
+# -- queue --
+
+class JobQueue:
+    """The jobs collection: enqueueing, claiming and finishing jobs"""
+
+    @property
+    def collection(self):
+        return mongodb_service.db.jobs
+
+    @guarded('jobs.enqueue')
+    def enqueue(self, job_type: str, user_id: str, params: Optional[Dict] = None,
+                job_id: Optional[str] = None) -> Dict:
+        """
+        Validate and queue a job; raises ValueError for unknown types or bad params.
+
+        ``job_id`` (reserved by an Idempotency-Key) makes the insert
+        repeatable: if that job already exists it is returned unchanged.
+        """
+        from pymongo.errors import DuplicateKeyError
+
+        if job_id is not None:
+            existing = self.collection.find_one(
+                {'_id': ObjectId(job_id), 'user_id': user_id}, {'params': 0}, max_time_ms=remaining_ms()
+            )
+            if existing:
+                return self.format_job(existing)
+
+        if job_type not in JOB_TYPES:
+            raise ValueError(f"Unknown job type: {job_type}")
+        if not isinstance(params or {}, dict):
+            raise ValueError("params must be an object")
+        now = datetime.utcnow()
+        job = {
+            'type': job_type,
+            'user_id': user_id,
+            'params': JOB_TYPES[job_type]().validate(params or {}),
+            'state': QUEUED,
+            'progress': {'done': 0, 'total': None, 'message': None},
+            'result': None,
+            'error': None,
+            'attempts': 0,
+            'run_at': now,
+            'created_at': now,
+            'updated_at': now,
+        }
+        if job_id is not None:
+            job['_id'] = ObjectId(job_id)
+        try:
+            job['_id'] = self.collection.insert_one(job).inserted_id
+        except DuplicateKeyError:
+            # Same reserved id inserted concurrently by a retry
+            return self.format_job(self.collection.find_one(
+                {'_id': job['_id'], 'user_id': user_id}, {'params': 0}, max_time_ms=remaining_ms()
+            ))
+        return self.format_job(job)
+
+    @guarded('jobs.get_job', idempotent=True)
+    def get_job(self, job_id: str, user_id: str) -> Optional[Dict]:
+        if not ObjectId.is_valid(job_id):
+            return None
+        job = self.collection.find_one(
+            {'_id': ObjectId(job_id), 'user_id': user_id}, {'params': 0}, max_time_ms=remaining_ms()
+        )
+        return self.format_job(job) if job else None
+
+    @guarded('jobs.get_jobs_by_user', idempotent=True)
+    def get_jobs_by_user(self, user_id: str, limit: int = 50) -> List[Dict]:
+        jobs = self.collection.find(
+            {'user_id': user_id}, {'params': 0, 'result': 0}, max_time_ms=remaining_ms()
+        ).sort('created_at', -1).limit(limit)
+        return [self.format_job(job) for job in jobs]
+
+    def claim(self, worker_id: str) -> Optional[Dict]:
+        """Atomically take the oldest runnable job: queued, or running with an expired lease"""
+        from pymongo import ReturnDocument
+
+        now = datetime.utcnow()
+        max_attempts = get_config('MAX_ATTEMPTS')
+        # A job whose worker died on its last attempt is not retried again
+        self.collection.update_many(
+            {'state': RUNNING, 'lease_until': {'$lt': now}, 'attempts': {'$gte': max_attempts}},
+            {'$set': {
+                'state': FAILED, 'error': f'Worker lost the job on attempt {max_attempts}',
+                'finished_at': now, 'updated_at': now,
+            }},
+        )
+        return self.collection.find_one_and_update(
+            {'$or': [
+                {'state': QUEUED, 'run_at': {'$lte': now}},
+                {'state': RUNNING, 'lease_until': {'$lt': now}, 'attempts': {'$lt': max_attempts}},
+            ]},
+            {
+                '$set': {
+                    'state': RUNNING,
+                    'worker': worker_id,
+                    'lease_until': now + timedelta(seconds=get_config('LEASE_SECONDS')),
+                    'started_at': now,
+                    'updated_at': now,
+                },
+                '$inc': {'attempts': 1},
+            },
+            sort=[('run_at', 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def renew(self, worker_id: str, job_ids: List[ObjectId]):
+        """Extend the leases of jobs this worker is still running"""
+        if job_ids:
+            self.collection.update_many(
+                {'_id': {'$in': job_ids}, 'worker': worker_id, 'state': RUNNING},
+                {'$set': {'lease_until': datetime.utcnow() + timedelta(seconds=get_config('LEASE_SECONDS'))}},
+            )
+
+    def report_progress(self, job: Dict, done: int, total: int, message: Optional[str] = None):
+        now = datetime.utcnow()
+        self.collection.update_one(
+            self._owned(job),
+            {'$set': {
+                'progress': {'done': done, 'total': total, 'message': message},
+                'lease_until': now + timedelta(seconds=get_config('LEASE_SECONDS')),
+                'updated_at': now,
+            }},
+        )
+
+    def succeed(self, job: Dict, result: Optional[Dict]):
+        now = datetime.utcnow()
+        self.collection.update_one(self._owned(job), {'$set': {
+            'state': SUCCEEDED, 'result': result, 'error': None,
+            'finished_at': now, 'updated_at': now,
+        }})
+
+    def fail(self, job: Dict, error: str, retry: bool):
+        """Requeue with a delay while attempts remain, otherwise mark failed"""
+        now = datetime.utcnow()
+        if retry and job['attempts'] < get_config('MAX_ATTEMPTS'):
+            update = {
+                'state': QUEUED, 'error': error, 'updated_at': now,
+                'run_at': now + timedelta(seconds=get_config('RETRY_DELAY_SECONDS') * job['attempts']),
+            }
+        else:
+            update = {'state': FAILED, 'error': error, 'finished_at': now, 'updated_at': now}
+        self.collection.update_one(self._owned(job), {'$set': update})
+
+    @staticmethod
+    def _owned(job: Dict) -> Dict:
+        """Filter matching the job only while this claim still holds it"""
+        return {'_id': job['_id'], 'worker': job['worker'], 'attempts': job['attempts']}
+
+    @staticmethod
+    def format_job(job: Dict) -> Dict:
+        return {
+            'id': str(job['_id']),
+            'type': job['type'],
+            'state': job['state'],
+            'progress': job.get('progress'),
+            'result': job.get('result'),
+            'error': job.get('error'),
+            'attempts': job.get('attempts', 0),
+            'created_at': job['created_at'],
+            'started_at': job.get('started_at'),
+            'finished_at': job.get('finished_at'),
+        }
+
+
+job_queue = JobQueue()
+
+
+# -- workers --
+
+class Worker:
+    """Runs ``threads`` claim/run loops in this process until ``stop()``"""
+
+    def __init__(self, threads: int = 1, name: Optional[str] = None):
+        self.threads = threads
+        self.id = name or f"{socket.gethostname()}:{os.getpid()}"
+        self._stopping = threading.Event()
+        self._running = set()
+        self._lock = threading.Lock()
+
+    def stop(self):
+        """Stop claiming jobs; jobs already running are finished"""
+        self._stopping.set()
+
+    def run(self):
+        """Block until stopped and every running job has finished"""
+        heartbeat = threading.Thread(target=self._heartbeat, name='job-heartbeat', daemon=True)
+        heartbeat.start()
+        loops = [
+            threading.Thread(target=self._loop, name=f'job-worker-{i}')
+            for i in range(self.threads)
+        ]
+        for loop in loops:
+            loop.start()
+        for loop in loops:
+            loop.join()
+
+    def run_pending(self) -> int:
+        """Run jobs until none is runnable; returns how many ran (for --once and tests)"""
+        count = 0
+        while self._run_one():
+            count += 1
+        return count
+
+    def _loop(self):
+        while not self._stopping.is_set():
+            try:
+                ran = self._run_one()
+            except Exception as e:
+                logger.error(f"Job worker {self.id} could not claim a job: {e}")
+                ran = False
+            if not ran:
+                self._stopping.wait(get_config('POLL_INTERVAL'))
+
+    def _run_one(self) -> bool:
+        job = job_queue.claim(self.id)
+        if job is None:
+            return False
+        with self._lock:
+            self._running.add(job['_id'])
+        logger.info(f"Running job {job['_id']} ({job['type']}), attempt {job['attempts']}")
+        try:
+            handler = JOB_TYPES[job['type']]()
+            result = handler.run(JobContext(job, job_queue))
+            job_queue.succeed(job, result)
+        except Exception as e:
+            logger.error(f"Job {job['_id']} ({job['type']}) failed: {e}")
+            # Bad input will not get better on a retry
+            job_queue.fail(job, str(e) or e.__class__.__name__, retry=not isinstance(e, (ValueError, KeyError)))
+        finally:
+            with self._lock:
+                self._running.discard(job['_id'])
+        return True
+
+    def _heartbeat(self):
+        interval = get_config('LEASE_SECONDS') / 3
+        while True:
+            with self._lock:
+                running = list(self._running)
+            try:
+                job_queue.renew(self.id, running)
+            except Exception as e:
+                logger.warning(f"Could not renew job leases: {e}")
+            if self._stopping.wait(interval) and not running:
+                return
@@ -6,6 +6,7 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken
 from .auth_backend import MongoDBUser
 from .user_service import user_service
+from .resilience import DatabaseUnavailable
 
 class MongoDBJWTAuthentication(JWTAuthentication):
     """Custom JWT Authentication that works with MongoDB users"""
@@ -18,6 +19,8 @@ class MongoDBJWTAuthentication(JWTAuthentication):
                 user_data = user_service.get_user_by_id(user_id)
                 if user_data:
                     return MongoDBUser(user_data)
+        except DatabaseUnavailable:
+            raise
         except Exception:
             pass
         
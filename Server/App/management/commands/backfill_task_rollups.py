@@ -0,0 +1,25 @@
+"""
+Django management command to (re)build the daily task analytics rollups
+"""
+
+from django.core.management.base import BaseCommand
+
+from App.analytics import task_rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild task_daily_stats from existing tasks with an aggregation pipeline'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--user', default=None,
+            help='Only rebuild this user id (default: every user)'
+        )
+
+    def handle(self, *args, **options):
+        scope = f"user {options['user']}" if options['user'] else 'all users'
+        self.stdout.write(f"🔄 Rebuilding task rollups for {scope}...")
+
+        written = task_rollups.rebuild(options['user'])
+
+        self.stdout.write(self.style.SUCCESS(f"\n🎉 {written} daily rollups corrected"))
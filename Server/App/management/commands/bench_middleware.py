@@ -0,0 +1,72 @@
+"""
+Django management command measuring per-request middleware overhead
+"""
+
+import time
+
+from django.conf import settings
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory, override_settings
+
+# The stack every request went through before BrowserOnlyMiddleware
+LEGACY_MIDDLEWARE = [
+    'corsheaders.middleware.CorsMiddleware',
+    'App.middleware.CompressionMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+
+class Command(BaseCommand):
+    help = 'Benchmark per-request middleware overhead of the legacy and path-scoped stacks'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=2000,
+            help='Requests per configuration (default: 2000)'
+        )
+        parser.add_argument(
+            '--path', default='/api/health/',
+            help='Path to request; should not need MongoDB (default: /api/health/)'
+        )
+
+    def handle(self, *args, **options):
+        configurations = [
+            ('no middleware', []),
+            ('legacy stack', LEGACY_MIDDLEWARE),
+            ('path-scoped', settings.MIDDLEWARE),
+        ]
+        results = {}
+        for name, middleware in configurations:
+            results[name] = self._time_requests(middleware, options['path'], options['requests'])
+
+        baseline = results['no middleware']
+        self.stdout.write(f"📊 GET {options['path']} x {options['requests']}")
+        for name, per_request in results.items():
+            self.stdout.write(
+                f"   {name:<14} {per_request:8.1f} µs/request"
+                f"   (+{per_request - baseline:6.1f} µs middleware)"
+            )
+
+    @staticmethod
+    def _time_requests(middleware, path, count):
+        """Average microseconds per request through a fresh WSGI handler"""
+        environ = RequestFactory().get(path).environ
+        with override_settings(MIDDLEWARE=middleware, ALLOWED_HOSTS=['testserver']):
+            handler = WSGIHandler()
+
+            def start_response(status, headers):
+                pass
+
+            for _ in range(min(count, 50)):  # warm up URL resolver and caches
+                handler(dict(environ), start_response).close()
+            start = time.perf_counter()
+            for _ in range(count):
+                handler(dict(environ), start_response).close()
+            return (time.perf_counter() - start) * 1_000_000 / count
@@ -0,0 +1,111 @@
+"""
+Django management command comparing the MongoDB text index and the
+in-memory inverted index used for task search
+"""
+
+import random
+import time
+from datetime import datetime
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand
+
+from App import search
+from App.mongodb_service import mongodb_service, task_service
+
+VOCABULARY = (
+    'report budget review meeting invoice client deploy release backend frontend '
+    'database migration design sprint planning roadmap bug fix test coverage '
+    'onboarding hiring interview feedback quarterly marketing campaign launch '
+    'customer support ticket refactor cleanup documentation security audit'
+).split()
+
+
+class Command(BaseCommand):
+    help = 'Benchmark task search on the MongoDB text index vs the in-memory inverted index'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks', type=int, default=2000,
+            help='Synthetic tasks inserted for a throwaway user (default: 2000)'
+        )
+        parser.add_argument(
+            '--queries', type=int, default=200,
+            help='Queries run per backend (default: 200)'
+        )
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Results per query (default: 20)'
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(42)
+        user_id = f"bench-search-{ObjectId()}"
+        queries = [
+            ' '.join(rng.sample(VOCABULARY, rng.randint(1, 3)))
+            for _ in range(options['queries'])
+        ]
+
+        self.stdout.write(f"🔄 Inserting {options['tasks']} tasks for {user_id}...")
+        self._seed(user_id, options['tasks'], rng)
+        try:
+            mongodb_service.ensure_indexes()
+            limit = options['limit']
+
+            text_ms, text_hits = self._time_queries(
+                lambda q: task_service._search_text_index(user_id, q, limit, None), queries
+            )
+
+            search.memory_search_index.clear()
+            start = time.perf_counter()
+            task_service._search_memory_index(user_id, queries[0], limit, None)
+            build_ms = (time.perf_counter() - start) * 1000
+            memory_ms, memory_hits = self._time_queries(
+                lambda q: task_service._search_memory_index(user_id, q, limit, None), queries
+            )
+        finally:
+            mongodb_service.tasks_collection.delete_many({'user_id': user_id})
+            search.memory_search_index.clear()
+
+        overlap = [
+            len({t['id'] for _, t in a} & {t['id'] for _, t in b}) / max(1, min(len(a), len(b)))
+            for a, b in zip(text_hits, memory_hits)
+        ]
+        self.stdout.write(
+            f"📊 {options['tasks']} tasks, {len(queries)} queries, top {limit}\n"
+            f"   {'backend':<14} {'avg ms':>8} {'p95 ms':>8}"
+        )
+        for name, timings in (('text index', text_ms), ('memory index', memory_ms)):
+            timings = sorted(timings)
+            self.stdout.write(
+                f"   {name:<14} {sum(timings) / len(timings):>8.2f} "
+                f"{timings[int(len(timings) * 0.95) - 1]:>8.2f}"
+            )
+        self.stdout.write(f"   memory index build: {build_ms:.1f} ms")
+        self.stdout.write(f"   top-{limit} overlap between backends: {sum(overlap) / len(overlap):.0%}")
+
+    @staticmethod
+    def _seed(user_id, count, rng):
+        now = datetime.utcnow()
+        mongodb_service.tasks_collection.insert_many([
+            {
+                'title': ' '.join(rng.choices(VOCABULARY, k=rng.randint(2, 5))).capitalize(),
+                'description': ' '.join(rng.choices(VOCABULARY, k=rng.randint(0, 30))),
+                'completed': False,
+                'user_id': user_id,
+                'tags': [],
+                'created_at': now,
+                'updated_at': now,
+            }
+            for _ in range(count)
+        ])
+
+    @staticmethod
+    def _time_queries(run, queries):
+        """Per-query wall time in milliseconds, and each query's results"""
+        timings, hits = [], []
+        for query in queries:
+            start = time.perf_counter()
+            hits.append(run(query))
+            timings.append((time.perf_counter() - start) * 1000)
+        return timings, hits
@@ -0,0 +1,78 @@
+"""
+Django management command comparing JSON and MessagePack task payloads
+"""
+
+import gzip
+import io
+import time
+from datetime import datetime, timedelta
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from App.mongodb_service import TaskService
+from App.parsers import MessagePackParser
+from App.renderers import MessagePackRenderer
+
+
+class Command(BaseCommand):
+    help = 'Benchmark payload size and encode/decode time of JSON vs MessagePack task lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tasks', type=int, default=1000,
+            help='Number of synthetic tasks in the payload (default: 1000)'
+        )
+        parser.add_argument(
+            '--repeat', type=int, default=50,
+            help='Encode/decode iterations per format (default: 50)'
+        )
+
+    def handle(self, *args, **options):
+        payload = self._build_payload(options['tasks'])
+        formats = [
+            ('JSON', JSONRenderer(), JSONParser()),
+            ('MessagePack', MessagePackRenderer(), MessagePackParser()),
+        ]
+
+        self.stdout.write(
+            f"📊 {options['tasks']} tasks, {options['repeat']} iterations\n"
+            f"   {'format':<12} {'bytes':>10} {'gzip bytes':>11} {'encode ms':>10} {'decode ms':>10}"
+        )
+        for name, renderer, parser in formats:
+            body = renderer.render(payload)
+            encode_ms = self._time(lambda: renderer.render(payload), options['repeat'])
+            decode_ms = self._time(lambda: parser.parse(io.BytesIO(body)), options['repeat'])
+            self.stdout.write(
+                f"   {name:<12} {len(body):>10} {len(gzip.compress(body)):>11} "
+                f"{encode_ms:>10.2f} {decode_ms:>10.2f}"
+            )
+
+    @staticmethod
+    def _time(func, repeat):
+        """Average wall time of ``func`` in milliseconds"""
+        start = time.perf_counter()
+        for _ in range(repeat):
+            func()
+        return (time.perf_counter() - start) * 1000 / repeat
+
+    @staticmethod
+    def _build_payload(count):
+        """Formatted tasks shaped exactly like GET /api/tasks/ responses"""
+        service = TaskService()
+        user_id = str(ObjectId())
+        now = datetime.utcnow()
+        return [
+            service._format_task({
+                '_id': ObjectId(),
+                'title': f'Task number {i}',
+                'description': 'Synthetic benchmark task description ' * (i % 4),
+                'completed': i % 3 == 0,
+                'user_id': user_id,
+                'created_at': now - timedelta(minutes=i),
+                'updated_at': now - timedelta(minutes=i // 2),
+            })
+            for i in range(count)
+        ]
@@ -0,0 +1,18 @@
+"""
+Django management command to create the MongoDB indexes TaskFlow relies on
+"""
+
+from django.core.management.base import BaseCommand
+from App.mongodb_service import mongodb_service
+
+class Command(BaseCommand):
+    help = 'Create MongoDB indexes declared in App.mongodb_service.INDEXES'
+
+    def handle(self, *args, **options):
+        self.stdout.write("🔄 Ensuring MongoDB indexes...")
+
+        created = mongodb_service.ensure_indexes()
+        for name in created:
+            self.stdout.write(f"✅ {name}")
+
+        self.stdout.write(self.style.SUCCESS(f"\n🎉 {len(created)} indexes in place"))
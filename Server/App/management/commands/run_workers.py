@@ -0,0 +1,77 @@
+"""
+Django management command running background job workers
+"""
+
+import multiprocessing
+import signal
+
+from django.core.management.base import BaseCommand
+
+from App.jobs import Worker, get_config
+
+
+def _process_main(threads):
+    """Entry point of a spawned worker process"""
+    import django
+    django.setup()
+    worker = Worker(threads=threads)
+    signal.signal(signal.SIGTERM, lambda *args: worker.stop())
+    signal.signal(signal.SIGINT, lambda *args: worker.stop())
+    worker.run()
+
+
+class Command(BaseCommand):
+    help = 'Run background job workers (see App/jobs.py)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=get_config('WORKERS'),
+            help='Concurrent jobs: threads, or processes with --mode process'
+        )
+        parser.add_argument(
+            '--mode', choices=['thread', 'process'], default=get_config('MODE'),
+            help='Run jobs in a thread pool or a pool of single-threaded processes'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Run every runnable job, then exit'
+        )
+
+    def handle(self, *args, **options):
+        if options['once']:
+            count = Worker().run_pending()
+            self.stdout.write(self.style.SUCCESS(f"🎉 Ran {count} jobs"))
+            return
+
+        self.stdout.write(
+            f"🔄 Starting {options['workers']} job worker {options['mode']}s (Ctrl+C to stop)..."
+        )
+        if options['mode'] == 'process':
+            self._run_processes(options['workers'])
+        else:
+            worker = Worker(threads=options['workers'])
+            signal.signal(signal.SIGTERM, lambda *args: worker.stop())
+            signal.signal(signal.SIGINT, lambda *args: worker.stop())
+            worker.run()
+        self.stdout.write(self.style.SUCCESS("✅ Workers stopped after finishing their running jobs"))
+
+    @staticmethod
+    def _run_processes(count):
+        # spawn, not fork: each process opens its own MongoClient
+        context = multiprocessing.get_context('spawn')
+        processes = [
+            context.Process(target=_process_main, args=(1,), name=f'job-worker-{i}')
+            for i in range(count)
+        ]
+        for process in processes:
+            process.start()
+
+        def stop(*args):
+            for process in processes:
+                if process.is_alive():
+                    process.terminate()  # SIGTERM: finish the running job, then exit
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+        for process in processes:
+            process.join()
@@ -0,0 +1,51 @@
+"""
+Django management command summarizing the slow MongoDB query log
+"""
+
+import json
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand
+from App.mongodb_service import mongodb_service
+from App.slow_queries import worst_query_shapes
+
+class Command(BaseCommand):
+    help = 'Summarize the worst recorded slow query shapes and flag collection scans'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Number of query shapes to show (default: 20)'
+        )
+        parser.add_argument(
+            '--hours', type=float, default=None,
+            help='Only consider queries recorded in the last N hours'
+        )
+
+    def handle(self, *args, **options):
+        since = datetime.utcnow() - timedelta(hours=options['hours']) if options['hours'] else None
+        shapes = worst_query_shapes(mongodb_service.db, limit=options['limit'], since=since)
+
+        if not shapes:
+            self.stdout.write("✅ No slow queries recorded")
+            return
+
+        self.stdout.write(f"🐢 Worst {len(shapes)} query shapes by total time\n")
+        for rank, shape in enumerate(shapes, 1):
+            key = shape['_id']
+            flag = "  ⚠️  COLLSCAN" if shape['collscans'] else ""
+            self.stdout.write(
+                f"{rank:>2}. {key['collection']}.{key['command']} {key['shape_key']}{flag}\n"
+                f"    from: {', '.join(op for op in shape['operations'] if op) or 'unknown'}\n"
+                f"    count: {shape['count']}  total: {shape['total_ms']:.0f} ms  "
+                f"avg: {shape['avg_ms']:.1f} ms  max: {shape['max_ms']:.1f} ms  "
+                f"avg docs returned: {shape['avg_docs_returned'] or 0:.1f}"
+            )
+            if shape['explained']:
+                plans = [' > '.join(plan) for plan in shape['plans'] if plan]
+                self.stdout.write(
+                    f"    explained: {shape['explained']}x  "
+                    f"max docs examined: {shape['max_docs_examined']}  "
+                    f"plans: {json.dumps(plans)}"
+                )
+            self.stdout.write("")
@@ -0,0 +1,148 @@
+"""
+Django management command that profiles cold-start time.
+
+Startup is measured in a fresh interpreter (this process has already paid
+for its imports), using ``python -X importtime`` for per-module import cost
+and timers around each stage of ``django.setup()`` and URLconf loading.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Runs inside the child interpreter. Prints one JSON line with stage timings;
+# -X importtime writes the per-import report to stderr.
+PROFILE_SCRIPT = r'''
+import json, time
+stages = []
+t0 = time.perf_counter()
+
+def mark(name, start):
+    stages.append([name, time.perf_counter() - start])
+
+start = time.perf_counter()
+import django
+from django.conf import settings
+settings.INSTALLED_APPS
+mark('settings', start)
+
+from django.apps import AppConfig
+
+_import_models = AppConfig.import_models
+
+def import_models(self):
+    start = time.perf_counter()
+    _import_models(self)
+    mark('models: ' + self.label, start)
+
+def timed_ready(config):
+    original = config.ready
+
+    def ready():
+        start = time.perf_counter()
+        original()
+        mark('ready: ' + config.label, start)
+    return ready
+
+start = time.perf_counter()
+from django.apps import apps
+AppConfig.import_models = import_models
+_create = AppConfig.create
+
+def create(entry):
+    start = time.perf_counter()
+    config = _create(entry)
+    config.ready = timed_ready(config)
+    mark('app config: ' + config.label, start)
+    return config
+
+AppConfig.create = staticmethod(create)
+django.setup()
+mark('django.setup (total)', start)
+
+start = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+mark('urlconf', start)
+
+start = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+get_wsgi_application()
+mark('wsgi handler', start)
+
+mark('total', t0)
+print(json.dumps(stages))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Report per-import and per-stage startup time in a fresh interpreter'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=25,
+            help='Number of slowest imports to show (default: 25)'
+        )
+        parser.add_argument(
+            '--min-ms', type=float, default=1.0,
+            help='Hide imports whose cumulative time is below this (default: 1.0)'
+        )
+        parser.add_argument(
+            '--prefix', default='',
+            help='Only report imports whose module name starts with this prefix'
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE)
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', PROFILE_SCRIPT],
+            cwd=str(settings.BASE_DIR),
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode != 0:
+            raise CommandError(f"Startup failed in child process:\n{result.stderr[-4000:]}")
+
+        stages = json.loads(result.stdout.strip().splitlines()[-1])
+        imports = self._parse_importtime(result.stderr)
+
+        self.stdout.write("⏱️  Startup stages")
+        for name, seconds in stages:
+            self.stdout.write(f"   {seconds * 1000:9.1f} ms  {name}")
+
+        imports = [
+            entry for entry in imports
+            if entry['cumulative_us'] / 1000 >= options['min_ms']
+            and entry['module'].startswith(options['prefix'])
+        ]
+        imports.sort(key=lambda entry: entry['cumulative_us'], reverse=True)
+
+        self.stdout.write(f"\n📦 Slowest imports (cumulative / self, top {options['limit']})")
+        for entry in imports[:options['limit']]:
+            self.stdout.write(
+                f"   {entry['cumulative_us'] / 1000:9.1f} ms  "
+                f"{entry['self_us'] / 1000:8.1f} ms  {entry['module']}"
+            )
+
+    @staticmethod
+    def _parse_importtime(stderr):
+        """Parse ``-X importtime`` lines: 'import time: self | cumulative | name'"""
+        entries = []
+        for line in stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            parts = line[len('import time:'):].split('|')
+            if len(parts) != 3 or not parts[0].strip().isdigit():
+                continue  # header row
+            entries.append({
+                'self_us': int(parts[0]),
+                'cumulative_us': int(parts[1]),
+                'module': parts[2].strip(),
+            })
+        return entries
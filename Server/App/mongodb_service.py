@@ -3,48 +3,205 @@ MongoDB Service for TaskFlow
 Handles MongoDB operations using PyMongo directly
 """
 
+import base64
 import os
-from datetime import datetime
+import threading
+from datetime import datetime, timedelta, timezone
 from typing import List, Dict, Optional
 from bson import ObjectId
-from pymongo import MongoClient
 from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
 import logging
 
+from .analytics import task_rollups
+from .ranking import rank_between, evenly_spaced_ranks
+from .resilience import guarded, is_transient, remaining_ms
+from . import search
+from .signals import task_saved, task_deleted
+from .singleflight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
+# Indexes created by `manage.py ensure_indexes`: collection -> [(keys, options)]
+INDEXES = {
+    'tasks': [
+        # Manual ordering; created_at breaks ties for tasks not yet ranked
+        ([('user_id', 1), ('rank', 1), ('created_at', -1)], {'name': 'user_rank'}),
+        # Tag filtering (multikey on tags)
+        ([('user_id', 1), ('tags', 1), ('created_at', -1)], {'name': 'user_tags'}),
+        # Full-text search, scoped by user (equality on user_id is required)
+        ([('user_id', 1), ('title', 'text'), ('description', 'text')], {
+            'name': 'user_text',
+            'weights': search.FIELD_WEIGHTS,
+        }),
+        # Delta sync: tasks changed since a token
+        ([('user_id', 1), ('updated_at', 1)], {'name': 'user_updated_at'}),
+        # Reminder scheduler: next incomplete tasks coming due. Tasks without
+        # a due date store due_at: null, which $exists would still match
+        ([('due_at', 1)], {
+            'name': 'open_due_at',
+            'partialFilterExpression': {'completed': False, 'due_at': {'$type': 'date'}},
+        }),
+    ],
+    'idempotency_keys': [
+        # Unique per (user, key) through _id; this only expires old records
+        ([('created_at', 1)], {
+            'name': 'created_at_ttl',
+            'expireAfterSeconds': getattr(settings, 'IDEMPOTENCY_KEYS', {}).get('TTL_SECONDS', 24 * 3600),
+        }),
+    ],
+    'jobs': [
+        # Claiming: oldest queued job, or a running one whose lease expired
+        ([('state', 1), ('run_at', 1)], {'name': 'state_run_at'}),
+        ([('state', 1), ('lease_until', 1)], {'name': 'state_lease_until'}),
+        ([('user_id', 1), ('created_at', -1)], {'name': 'user_created_at'}),
+        # Finished jobs (and their results) are kept for a while, then expire
+        ([('finished_at', 1)], {
+            'name': 'finished_at_ttl',
+            'expireAfterSeconds': getattr(settings, 'BACKGROUND_JOBS', {}).get('RETENTION_SECONDS', 7 * 24 * 3600),
+        }),
+    ],
+    'task_daily_stats': [
+        # One rollup document per user and day
+        ([('user_id', 1), ('day', 1)], {'name': 'user_day', 'unique': True}),
+    ],
+    'task_tombstones': [
+        ([('user_id', 1), ('deleted_at', 1)], {'name': 'user_deleted_at'}),
+        ([('deleted_at', 1)], {
+            'name': 'deleted_at_ttl',
+            'expireAfterSeconds': getattr(settings, 'TASK_TOMBSTONE_TTL_SECONDS', 30 * 24 * 3600),
+        }),
+    ],
+}
+
+# Rank keys longer than this trigger a background rebalance for the user
+RANK_MAX_LENGTH = getattr(settings, 'TASK_RANK_MAX_LENGTH', 32)
+
+# Upper bound on ids accepted by a single multi-get
+LOOKUP_MAX_IDS = getattr(settings, 'TASK_LOOKUP_MAX_IDS', 500)
+
+# Sync tokens older than the tombstone TTL can no longer see every deletion
+TOMBSTONE_TTL = timedelta(seconds=getattr(settings, 'TASK_TOMBSTONE_TTL_SECONDS', 30 * 24 * 3600))
+
+# New sync tokens lag "now" by this much, so writes still in flight when a
+# sync runs are picked up by the next one (clients apply changes idempotently)
+SYNC_OVERLAP = timedelta(seconds=getattr(settings, 'TASK_SYNC_OVERLAP_SECONDS', 5))
+
+# Share one in-flight query between concurrent identical task list reads
+READ_COALESCING = getattr(settings, 'TASK_READ_COALESCING', True)
+
+# Page size bounds for task search
+SEARCH_DEFAULT_LIMIT = 20
+SEARCH_MAX_LIMIT = 100
+
+# Limits on task labels
+MAX_TAGS_PER_TASK = 20
+MAX_TAG_LENGTH = 50
+
+
+def normalize_tags(tags) -> List[str]:
+    """Strip and de-duplicate tags (keeping order); raises ValueError if invalid"""
+    if not isinstance(tags, (list, tuple)) or not all(isinstance(tag, str) for tag in tags):
+        raise ValueError("Tags must be a list of strings")
+    normalized = []
+    for tag in tags:
+        tag = tag.strip()
+        if not tag:
+            continue
+        if len(tag) > MAX_TAG_LENGTH:
+            raise ValueError(f"Tags can be at most {MAX_TAG_LENGTH} characters")
+        if tag not in normalized:
+            normalized.append(tag)
+    if len(normalized) > MAX_TAGS_PER_TASK:
+        raise ValueError(f"A task can have at most {MAX_TAGS_PER_TASK} tags")
+    return normalized
+
+
+def normalize_due_at(value) -> Optional[datetime]:
+    """Due date as naive UTC (how Mongo stores it), from a datetime or ISO string"""
+    from django.utils.dateparse import parse_datetime
+
+    if value in (None, ''):
+        return None
+    if isinstance(value, str):
+        parsed = parse_datetime(value)
+        if parsed is None:
+            raise ValueError("due_at must be an ISO 8601 datetime")
+        value = parsed
+    if not isinstance(value, datetime):
+        raise ValueError("due_at must be an ISO 8601 datetime")
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+class SyncTokenExpired(ValueError):
+    """Raised when a sync token predates the tombstone TTL"""
+
+
+def encode_sync_token(moment: datetime) -> str:
+    """Opaque sync token for a point in time (millisecond precision, like Mongo)"""
+    millis = int((moment - datetime(1970, 1, 1)).total_seconds() * 1000)
+    return base64.urlsafe_b64encode(str(millis).encode()).decode().rstrip('=')
+
+
+def decode_sync_token(token: str) -> datetime:
+    """Inverse of encode_sync_token; raises ValueError for malformed tokens"""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        millis = int(base64.urlsafe_b64decode(padded.encode()).decode())
+        return datetime(1970, 1, 1) + timedelta(milliseconds=millis)
+    except Exception:
+        raise ValueError("Invalid sync token")
+
 class MongoDBService:
+    """
+    Lazily connected MongoDB client holder.
+
+    Nothing here touches the network (or even imports pymongo) until the
+    first access to ``db``, so importing this module is cheap at startup.
+    """
     _instance = None
     _client = None
     _db = None
+    _lock = threading.Lock()
 
     def __new__(cls):
         if cls._instance is None:
             cls._instance = super(MongoDBService, cls).__new__(cls)
         return cls._instance
 
-    def __init__(self):
-        if self._client is None:
-            self.connect()
-
     def connect(self):
         """Connect to MongoDB"""
-        try:
-            mongodb_settings = settings.MONGODB_SETTINGS
-            self._client = MongoClient(mongodb_settings['URI'])
-            self._db = self._client[mongodb_settings['DB_NAME']]
-            
-            # Test connection
-            self._client.admin.command('ping')
-            logger.info(f"✅ Connected to MongoDB: {mongodb_settings['DB_NAME']}")
-            
-        except Exception as e:
-            logger.error(f"❌ MongoDB connection failed: {e}")
-            raise
+        from pymongo import MongoClient
+        from .slow_queries import slow_query_recorder
+
+        with self._lock:
+            if self._db is not None:
+                return
+            try:
+                mongodb_settings = settings.MONGODB_SETTINGS
+                # Bounded timeouts so an unreachable server fails fast instead
+                # of blocking for PyMongo's 30s default server selection
+                client = MongoClient(
+                    mongodb_settings['URI'],
+                    serverSelectionTimeoutMS=mongodb_settings.get('SERVER_SELECTION_TIMEOUT_MS', 3000),
+                    connectTimeoutMS=mongodb_settings.get('CONNECT_TIMEOUT_MS', 3000),
+                    socketTimeoutMS=mongodb_settings.get('SOCKET_TIMEOUT_MS', 6000),
+                    event_listeners=[slow_query_recorder],
+                )
+                self._db = client[mongodb_settings['DB_NAME']]
+                slow_query_recorder.bind(self._db)
+                self._client = client
+                logger.info(f"✅ Connected to MongoDB: {mongodb_settings['DB_NAME']}")
+
+            except Exception as e:
+                logger.error(f"❌ MongoDB connection failed: {e}")
+                raise
 
     @property
     def db(self):
-        """Get database instance"""
+        """Get database instance, connecting on first use"""
         if self._db is None:
             self.connect()
         return self._db
@@ -54,6 +211,34 @@ class MongoDBService:
         """Get tasks collection"""
         return self.db.tasks
 
+    @property
+    def tombstones_collection(self):
+        """Get deleted-task tombstones collection"""
+        return self.db.task_tombstones
+
+    def ensure_indexes(self) -> List[str]:
+        """
+        Create all indexes declared in INDEXES (no-op for existing ones).
+
+        An existing index whose options changed (partial filter, TTL) is
+        dropped and recreated under the same name.
+        """
+        from pymongo.errors import OperationFailure
+
+        created = []
+        for collection_name, indexes in INDEXES.items():
+            collection = self.db[collection_name]
+            for keys, options in indexes:
+                try:
+                    created.append(collection.create_index(keys, **options))
+                except OperationFailure as e:
+                    if e.code not in (85, 86):  # IndexOptionsConflict, IndexKeySpecsConflict
+                        raise
+                    logger.info(f"Recreating index {collection_name}.{options['name']} with new options")
+                    collection.drop_index(options['name'])
+                    created.append(collection.create_index(keys, **options))
+        return created
+
     def close(self):
         """Close MongoDB connection"""
         if self._client:
@@ -61,78 +246,565 @@ class MongoDBService:
             self._client = None
             self._db = None
 
-# Global MongoDB service instance
+# Global MongoDB service instance (connects on first use)
 mongodb_service = MongoDBService()
 
 class TaskService:
     """Service class for Task operations"""
-    
+
+    # Display order: ascending rank, newest first among unranked tasks
+    SORT_ORDER = [('rank', 1), ('created_at', -1)]
+
     def __init__(self):
-        self.collection = mongodb_service.tasks_collection
+        self._rebalancing = set()
+        self._rebalance_lock = threading.Lock()
+        self.reads = SingleFlight()
+
+    @property
+    def collection(self):
+        """Tasks collection, resolved on first use"""
+        return mongodb_service.tasks_collection
+
+    @guarded('tasks.create_task')
+    def create_task(self, title: str, description: str, user_id: str, completed: bool = False,
+                    tags: Optional[List[str]] = None, due_at=None, task_id: Optional[str] = None) -> Dict:
+        """
+        Create a new task.
+
+        ``task_id`` (reserved by an Idempotency-Key) makes the insert
+        repeatable: if that task already exists it is returned unchanged.
+        """
+        from pymongo.errors import DuplicateKeyError
+
+        if task_id is not None:
+            existing = self.collection.find_one({'_id': ObjectId(task_id), 'user_id': user_id}, max_time_ms=remaining_ms())
+            if existing:
+                return self._format_task(existing)
 
-    def create_task(self, title: str, description: str, user_id: str, completed: bool = False) -> Dict:
-        """Create a new task"""
         task_data = {
             'title': title,
             'description': description,
             'completed': completed,
             'user_id': user_id,
+            'tags': normalize_tags(tags or []),
+            'due_at': normalize_due_at(due_at),
+            'rank': rank_between(None, self._first_rank(user_id), tiebreak=True),
             'created_at': datetime.utcnow(),
             'updated_at': datetime.utcnow()
         }
+        task_data['completed_at'] = task_data['created_at'] if completed else None
         
-        result = self.collection.insert_one(task_data)
+        if task_id is not None:
+            task_data['_id'] = ObjectId(task_id)
+        try:
+            result = self.collection.insert_one(task_data)
+        except DuplicateKeyError:
+            # Same reserved id inserted concurrently by a retry
+            return self._format_task(self.collection.find_one(
+                {'_id': task_data['_id'], 'user_id': user_id}, max_time_ms=remaining_ms()
+            ))
         task_data['_id'] = result.inserted_id
         task_data['id'] = str(result.inserted_id)  # Add string ID for frontend
         
-        return self._format_task(task_data)
+        task_rollups.record_created(user_id, task_data['created_at'], task_data['completed_at'])
+        task = self._format_task(task_data)
+        self._task_saved(task, created=True)
+        return task
+
+    def get_tasks_by_user(self, user_id: str, tag: Optional[str] = None,
+                          tags_all: Optional[List[str]] = None) -> List[Dict]:
+        """
+        Get all tasks for a specific user, optionally only those with the given tags.
+
+        Concurrent identical calls share one query and one result list
+        (see App/singleflight.py), so callers must not mutate it.
+        """
+        if not READ_COALESCING:
+            return self._get_tasks_by_user(user_id, tag, tags_all)
+        key = (user_id, 'get_tasks_by_user', tag, tuple(tags_all or ()))
+        return self.reads.do(key, lambda: self._get_tasks_by_user(user_id, tag, tags_all))
 
-    def get_tasks_by_user(self, user_id: str) -> List[Dict]:
-        """Get all tasks for a specific user"""
-        tasks = list(self.collection.find({'user_id': user_id}).sort('created_at', -1))
+    @guarded('tasks.get_tasks_by_user', idempotent=True)
+    def _get_tasks_by_user(self, user_id: str, tag: Optional[str],
+                           tags_all: Optional[List[str]]) -> List[Dict]:
+        query = {'user_id': user_id}
+        required_tags = ([tag] if tag else []) + list(tags_all or [])
+        if len(required_tags) == 1:
+            query['tags'] = required_tags[0]
+        elif required_tags:
+            query['tags'] = {'$all': required_tags}
+
+        tasks = list(self.collection.find(query, max_time_ms=remaining_ms()).sort(self.SORT_ORDER))
         return [self._format_task(task) for task in tasks]
 
+    @guarded('tasks.get_task_by_id', idempotent=True)
     def get_task_by_id(self, task_id: str, user_id: str) -> Optional[Dict]:
         """Get a specific task by ID and user"""
         try:
             object_id = ObjectId(task_id)
-            task = self.collection.find_one({'_id': object_id, 'user_id': user_id})
+            task = self.collection.find_one({'_id': object_id, 'user_id': user_id}, max_time_ms=remaining_ms())
             return self._format_task(task) if task else None
         except Exception as e:
+            if is_transient(e):
+                raise
             logger.error(f"Error getting task {task_id}: {e}")
             return None
 
+    @guarded('tasks.get_tasks_by_ids', idempotent=True)
+    def get_tasks_by_ids(self, task_ids: List[str], user_id: str) -> List[Dict]:
+        """
+        Get several of a user's tasks with a single query.
+
+        Results follow the order of ``task_ids``; ids that are unknown,
+        malformed or owned by another user come back as
+        ``{'id': ..., 'error': 'Task not found'}`` entries.
+        """
+        if len(task_ids) > LOOKUP_MAX_IDS:
+            raise ValueError(f"At most {LOOKUP_MAX_IDS} ids can be requested at once")
+
+        object_ids = set()
+        for task_id in task_ids:
+            if ObjectId.is_valid(task_id):
+                object_ids.add(ObjectId(task_id))
+
+        found = {}
+        if object_ids:
+            for task in self.collection.find({'_id': {'$in': list(object_ids)}, 'user_id': user_id}, max_time_ms=remaining_ms()):
+                found[str(task['_id'])] = self._format_task(task)
+
+        return [
+            found.get(task_id) or {'id': task_id, 'error': 'Task not found'}
+            for task_id in task_ids
+        ]
+
+    @guarded('tasks.update_task')
     def update_task(self, task_id: str, user_id: str, update_data: Dict) -> Optional[Dict]:
         """Update a task"""
+        from pymongo import ReturnDocument
+
+        if 'due_at' in update_data:
+            update_data['due_at'] = normalize_due_at(update_data['due_at'])
+            # A new due date earns a new reminder
+            update_data['reminded_at'] = None
+
         try:
             object_id = ObjectId(task_id)
             update_data['updated_at'] = datetime.utcnow()
+
+            if 'completed' in update_data:
+                self._set_completed(object_id, user_id, update_data.pop('completed'), update_data['updated_at'])
             
-            result = self.collection.update_one(
+            task = self.collection.find_one_and_update(
                 {'_id': object_id, 'user_id': user_id},
-                {'$set': update_data}
+                {'$set': update_data},
+                return_document=ReturnDocument.AFTER,
+                maxTimeMS=remaining_ms(),
             )
             
-            if result.modified_count > 0:
-                return self.get_task_by_id(task_id, user_id)
+            if task:
+                task = self._format_task(task)
+                self._task_saved(task)
+                return task
             return None
             
         except Exception as e:
+            if is_transient(e):
+                raise
             logger.error(f"Error updating task {task_id}: {e}")
             return None
 
+    @guarded('tasks.delete_task')
     def delete_task(self, task_id: str, user_id: str) -> bool:
         """Delete a task"""
         try:
             object_id = ObjectId(task_id)
-            result = self.collection.delete_one({'_id': object_id, 'user_id': user_id})
-            return result.deleted_count > 0
+            task = self.collection.find_one_and_delete(
+                {'_id': object_id, 'user_id': user_id},
+                projection={'created_at': 1, 'updated_at': 1, 'completed': 1, 'completed_at': 1},
+                maxTimeMS=remaining_ms(),
+            )
+            if task is None:
+                return False
+            task_rollups.record_deleted(user_id, task)
+
+            # Keep a tombstone so delta-sync clients learn about the delete
+            mongodb_service.tombstones_collection.insert_one({
+                'task_id': task_id,
+                'user_id': user_id,
+                'deleted_at': datetime.utcnow(),
+            })
+            self._task_deleted(task_id, user_id)
+            return True
         except Exception as e:
+            if is_transient(e):
+                raise
             logger.error(f"Error deleting task {task_id}: {e}")
             return False
 
+    @guarded('tasks.update_tags')
+    def update_tags(self, task_id: str, user_id: str, add: Optional[List[str]] = None,
+                    remove: Optional[List[str]] = None) -> Optional[Dict]:
+        """
+        Add and remove tags without rewriting the task's tag array.
+
+        Uses $pull then $addToSet (they cannot target the same field in one
+        update). Returns the updated task, or None if it does not exist;
+        raises ValueError for invalid tags or when the limit would be exceeded.
+        """
+        from pymongo import ReturnDocument
+
+        add = normalize_tags(add or [])
+        remove = [tag for tag in normalize_tags(remove or []) if tag not in add]
+        try:
+            object_id = ObjectId(task_id)
+        except Exception:
+            return None
+
+        selector = {'_id': object_id, 'user_id': user_id}
+        now = datetime.utcnow()
+        task = None
+        if remove:
+            task = self.collection.find_one_and_update(
+                selector,
+                {'$pull': {'tags': {'$in': remove}}, '$set': {'updated_at': now}},
+                return_document=ReturnDocument.AFTER,
+                maxTimeMS=remaining_ms()
+            )
+            if task is None:
+                return None
+        if add:
+            # Only match while there is room for every added tag, so the
+            # limit holds even under concurrent updates
+            room = {f'tags.{MAX_TAGS_PER_TASK - len(add)}': {'$exists': False}}
+            task = self.collection.find_one_and_update(
+                {**selector, **room},
+                {'$addToSet': {'tags': {'$each': add}}, '$set': {'updated_at': now}},
+                return_document=ReturnDocument.AFTER,
+                maxTimeMS=remaining_ms()
+            )
+            if task is None:
+                if self.collection.find_one(selector, {'_id': 1}, max_time_ms=remaining_ms()) is None:
+                    return None
+                raise ValueError(f"A task can have at most {MAX_TAGS_PER_TASK} tags")
+        if not add and not remove:
+            task = self.collection.find_one(selector, max_time_ms=remaining_ms())
+            return self._format_task(task) if task else None
+
+        task = self._format_task(task)
+        self._task_saved(task)
+        return task
+
+    @guarded('tasks.get_tag_counts', idempotent=True)
+    def get_tag_counts(self, user_id: str) -> List[Dict]:
+        """Per-tag task counts for a user, most used first"""
+        pipeline = [
+            {'$match': {'user_id': user_id, 'tags.0': {'$exists': True}}},
+            {'$unwind': '$tags'},
+            {'$group': {
+                '_id': '$tags',
+                'count': {'$sum': 1},
+                'open': {'$sum': {'$cond': ['$completed', 0, 1]}},
+            }},
+            {'$sort': {'count': -1, '_id': 1}},
+        ]
+        return [
+            {'tag': row['_id'], 'count': row['count'], 'open': row['open']}
+            for row in self.collection.aggregate(pipeline, maxTimeMS=remaining_ms())
+        ]
+
+    @guarded('tasks.search_tasks', idempotent=True)
+    def search_tasks(self, user_id: str, query: str, limit: int = SEARCH_DEFAULT_LIMIT,
+                     cursor: Optional[str] = None) -> Dict:
+        """
+        Full-text search over a user's task titles and descriptions.
+
+        Results are ranked by relevance (MongoDB textScore, or BM25 in the
+        in-memory fallback) and carry ``score`` and ``highlights`` with match
+        offsets. Pass the returned ``next_cursor`` to get the next page.
+        """
+        query = (query or '').strip()
+        if not query:
+            raise ValueError("Search query is required")
+        if not 1 <= limit <= SEARCH_MAX_LIMIT:
+            raise ValueError(f"limit must be between 1 and {SEARCH_MAX_LIMIT}")
+        after = search.decode_cursor(cursor) if cursor else None
+        if after and not ObjectId.is_valid(after[1]):
+            raise ValueError("Invalid search cursor")
+
+        backend = search.get_config('BACKEND')
+        if backend not in search.BACKENDS:
+            raise ImproperlyConfigured(
+                f"TASK_SEARCH['BACKEND'] must be one of {', '.join(search.BACKENDS)}, not {backend!r}"
+            )
+        if backend == 'mongo':
+            from pymongo.errors import OperationFailure
+            try:
+                hits = self._search_text_index(user_id, query, limit + 1, after)
+            except OperationFailure as e:
+                if e.code != 27:  # IndexNotFound: no text index on the collection
+                    raise
+                logger.warning("No text index on tasks, falling back to in-memory search")
+                backend = 'memory'
+        if backend == 'memory':
+            hits = self._search_memory_index(user_id, query, limit + 1, after)
+
+        terms = search.tokenize(query)
+        snippet_length = search.get_config('SNIPPET_LENGTH')
+        results = []
+        for score, task in hits[:limit]:
+            results.append(dict(
+                task,
+                score=score,
+                highlights={
+                    'title': search.highlight(task['title'], terms),
+                    'description': search.highlight(task['description'], terms, snippet_length),
+                },
+            ))
+        next_cursor = None
+        if len(hits) > limit:
+            next_cursor = search.encode_cursor(results[-1]['score'], results[-1]['id'])
+        return {'results': results, 'next_cursor': next_cursor, 'backend': backend}
+
+    def _search_text_index(self, user_id: str, query: str, limit: int, after) -> List:
+        """(score, task) pairs from the user_text index, best first, after a cursor"""
+        pipeline = [
+            {'$match': {'user_id': user_id, '$text': {'$search': query}}},
+            {'$addFields': {'_score': {'$meta': 'textScore'}}},
+        ]
+        if after:
+            score, task_id = after
+            pipeline.append({'$match': {'$or': [
+                {'_score': {'$lt': score}},
+                {'_score': score, '_id': {'$gt': ObjectId(task_id)}},
+            ]}})
+        pipeline += [
+            {'$sort': {'_score': -1, '_id': 1}},
+            {'$limit': limit},
+        ]
+        return [
+            (task['_score'], self._format_task(task))
+            for task in self.collection.aggregate(pipeline, maxTimeMS=remaining_ms())
+        ]
+
+    def _search_memory_index(self, user_id: str, query: str, limit: int, after) -> List:
+        """(score, task) pairs from the in-process inverted index, best first, after a cursor"""
+        hits = search.memory_search_index.search(
+            user_id,
+            search.tokenize(query),
+            lambda uid: [
+                self._format_task(task)
+                for task in self.collection.find({'user_id': uid}, max_time_ms=remaining_ms())
+            ],
+        )
+        if after:
+            score, task_id = after
+            hits = [(s, task) for s, task in hits if s < score or (s == score and task['id'] > task_id)]
+        return hits[:limit]
+
+    @guarded('tasks.get_analytics', idempotent=True)
+    def get_analytics(self, user_id: str, days: int, group: str = 'day') -> Dict:
+        """Tasks created and completed per day or week, read from the daily rollups"""
+        return task_rollups.get_series(user_id, days, group)
+
+    @guarded('tasks.get_changes', idempotent=True)
+    def get_changes(self, user_id: str, since: Optional[str] = None) -> Dict:
+        """
+        Tasks created or updated, and ids deleted, since a sync token.
+
+        Without a token every task is returned (a full sync). The response
+        carries a new token to pass on the next call. Raises ValueError for
+        malformed tokens and SyncTokenExpired once tombstones may be gone.
+        """
+        now = datetime.utcnow()
+        next_token = encode_sync_token(now - SYNC_OVERLAP)
+
+        if since is None:
+            return {
+                'full': True,
+                'tasks': self.get_tasks_by_user(user_id),
+                'deleted': [],
+                'token': next_token,
+            }
+
+        since_at = decode_sync_token(since)
+        if since_at < now - TOMBSTONE_TTL:
+            raise SyncTokenExpired("Sync token expired, full resync required")
+
+        tasks = self.collection.find(
+            {'user_id': user_id, 'updated_at': {'$gte': since_at}},
+            max_time_ms=remaining_ms()
+        ).sort('updated_at', 1)
+        tombstones = mongodb_service.tombstones_collection.find(
+            {'user_id': user_id, 'deleted_at': {'$gte': since_at}},
+            {'task_id': 1},
+            max_time_ms=remaining_ms()
+        )
+        return {
+            'full': False,
+            'tasks': [self._format_task(task) for task in tasks],
+            'deleted': sorted({tombstone['task_id'] for tombstone in tombstones}),
+            'token': max(next_token, since, key=decode_sync_token),
+        }
+
+    @guarded('tasks.move_task')
+    def move_task(self, task_id: str, user_id: str, before_id: Optional[str] = None,
+                  after_id: Optional[str] = None) -> Optional[Dict]:
+        """
+        Move a task between two neighbours in the user's list.
+
+        ``before_id`` is the task that should end up directly above it and
+        ``after_id`` the one directly below; either may be None for the top
+        or bottom of the list. Only the moved task is written. Returns None
+        if the task does not exist and raises ValueError for bad neighbours.
+        """
+        from pymongo import ReturnDocument
+
+        neighbour_ids = [i for i in (before_id, after_id) if i]
+        if task_id in neighbour_ids:
+            raise ValueError("A task cannot be its own neighbour")
+        try:
+            object_id = ObjectId(task_id)
+            neighbour_object_ids = [ObjectId(i) for i in neighbour_ids]
+        except Exception:
+            raise ValueError("Invalid task id")
+
+        for attempt in range(2):
+            neighbours = {
+                str(doc['_id']): doc
+                for doc in self.collection.find(
+                    {'_id': {'$in': neighbour_object_ids}, 'user_id': user_id},
+                    {'rank': 1},
+                    max_time_ms=remaining_ms()
+                )
+            }
+            if len(neighbours) != len(set(neighbour_ids)):
+                raise ValueError("Neighbour task not found")
+            before_rank = neighbours[before_id].get('rank') if before_id else None
+            after_rank = neighbours[after_id].get('rank') if after_id else None
+            unranked = any('rank' not in doc for doc in neighbours.values())
+            collided = before_rank is not None and after_rank is not None and before_rank >= after_rank
+            if not (unranked or collided):
+                break
+            if attempt:
+                raise ValueError("'before' must be above 'after' in the list")
+            # Tasks created before manual ordering existed, or neighbours whose
+            # ranks collided under concurrent writes: rank the list afresh
+            self.rebalance_ranks(user_id)
+
+        rank = rank_between(before_rank, after_rank, tiebreak=True)
+        task = self.collection.find_one_and_update(
+            {'_id': object_id, 'user_id': user_id},
+            {'$set': {'rank': rank, 'updated_at': datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER,
+            maxTimeMS=remaining_ms()
+        )
+        if not task:
+            return None
+        if len(rank) > RANK_MAX_LENGTH:
+            self._schedule_rebalance(user_id)
+
+        task = self._format_task(task)
+        self._task_saved(task)
+        return task
+
+    @guarded('tasks.rebalance_ranks')
+    def rebalance_ranks(self, user_id: str) -> int:
+        """Rewrite a user's ranks as short, evenly spaced keys in current order"""
+        from pymongo import UpdateOne
+
+        task_ids = [
+            doc['_id'] for doc in
+            self.collection.find(
+                {'user_id': user_id}, {'_id': 1}, max_time_ms=remaining_ms()
+            ).sort(self.SORT_ORDER)
+        ]
+        if not task_ids:
+            return 0
+        now = datetime.utcnow()
+        self.collection.bulk_write([
+            UpdateOne({'_id': task_id}, {'$set': {'rank': rank, 'updated_at': now}})
+            for task_id, rank in zip(task_ids, evenly_spaced_ranks(len(task_ids)))
+        ], ordered=False)
+        self.reads.forget(user_id)
+        logger.info(f"Rebalanced {len(task_ids)} task ranks for user {user_id}")
+        return len(task_ids)
+
+    def _set_completed(self, object_id: ObjectId, user_id: str, completed: bool, now: datetime):
+        """
+        Flip ``completed`` (and ``completed_at``) only if it actually changes.
+
+        The conditional filter makes the flip atomic, so of several
+        concurrent identical toggles exactly one updates the daily rollups.
+        """
+        from pymongo import ReturnDocument
+
+        before = self.collection.find_one_and_update(
+            {'_id': object_id, 'user_id': user_id, 'completed': {'$ne': completed}},
+            {'$set': {'completed': completed, 'completed_at': now if completed else None}},
+            projection={'completed_at': 1, 'updated_at': 1},
+            return_document=ReturnDocument.BEFORE,
+            maxTimeMS=remaining_ms(),
+        )
+        if before is None:
+            return  # unchanged, or not the user's task
+        if completed:
+            task_rollups.record_completion(user_id, completed_at=now)
+        else:
+            task_rollups.record_completion(user_id, uncompleted=before.get('completed_at') or before['updated_at'])
+
+    def _schedule_rebalance(self, user_id: str):
+        """Rebalance a user's ranks on a background thread (once at a time)"""
+        with self._rebalance_lock:
+            if user_id in self._rebalancing:
+                return
+            self._rebalancing.add(user_id)
+
+        def run():
+            try:
+                self.rebalance_ranks(user_id)
+            except Exception as e:
+                logger.error(f"Error rebalancing ranks for user {user_id}: {e}")
+            finally:
+                with self._rebalance_lock:
+                    self._rebalancing.discard(user_id)
+
+        threading.Thread(target=run, name=f'rank-rebalance-{user_id}', daemon=True).start()
+
+    def _first_rank(self, user_id: str) -> Optional[str]:
+        """Rank of the task at the top of the user's list, if any"""
+        first = self.collection.find_one(
+            {'user_id': user_id}, {'rank': 1}, sort=self.SORT_ORDER, max_time_ms=remaining_ms()
+        )
+        if first and 'rank' not in first:
+            self.rebalance_ranks(user_id)
+            first = self.collection.find_one(
+                {'user_id': user_id}, {'rank': 1}, sort=self.SORT_ORDER, max_time_ms=remaining_ms()
+            )
+        if first and len(first['rank']) >= RANK_MAX_LENGTH:
+            self._schedule_rebalance(user_id)
+        return first['rank'] if first else None
+
+    def _task_saved(self, task: Dict, created: bool = False):
+        """Drop the user's in-flight reads and notify task_saved receivers (errors are logged)"""
+        self.reads.forget(task['user_id'])
+        for receiver, response in task_saved.send_robust(sender=TaskService, task=task, created=created):
+            if isinstance(response, Exception):
+                logger.error(f"task_saved receiver {receiver} failed: {response}")
+
+    def _task_deleted(self, task_id: str, user_id: str):
+        """Drop the user's in-flight reads and notify task_deleted receivers (errors are logged)"""
+        self.reads.forget(user_id)
+        for receiver, response in task_deleted.send_robust(sender=TaskService, task_id=task_id, user_id=user_id):
+            if isinstance(response, Exception):
+                logger.error(f"task_deleted receiver {receiver} failed: {response}")
+
     def _format_task(self, task: Dict) -> Dict:
-        """Format task for API response"""
+        """
+        Format task for API response.
+
+        Timestamps stay as datetimes: the JSON renderer writes them in ISO
+        format and the MessagePack renderer as native timestamps.
+        """
         if not task:
             return None
             
@@ -142,9 +814,13 @@ class TaskService:
             'description': task['description'],
             'completed': task['completed'],
             'user_id': task['user_id'],
-            'created_at': task['created_at'].isoformat() if task['created_at'] else None,
-            'updated_at': task['updated_at'].isoformat() if task['updated_at'] else None,
+            'rank': task.get('rank'),
+            'tags': task.get('tags', []),
+            'due_at': task.get('due_at'),
+            'completed_at': task.get('completed_at'),
+            'created_at': task['created_at'],
+            'updated_at': task['updated_at'],
         }
 
-# Global task service instance
+# Global task service instance (no database access until first call)
 task_service = TaskService()
\ No newline at end of file
@@ -0,0 +1,32 @@
+"""
+MessagePack parser for TaskFlow API clients
+Used for request bodies sent with ``Content-Type: application/msgpack``
+"""
+
+import msgpack
+from bson import ObjectId
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+from .renderers import OBJECTID_EXT_TYPE
+
+
+def decode_extra(code, data):
+    """msgpack ``ext_hook`` that restores ObjectIds packed by the renderer"""
+    if code == OBJECTID_EXT_TYPE:
+        return ObjectId(data)
+    return msgpack.ExtType(code, data)
+
+
+class MessagePackParser(BaseParser):
+    """Parses MessagePack-serialized data"""
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            # timestamp=3 decodes native timestamps to aware UTC datetimes
+            return msgpack.unpackb(
+                stream.read(), raw=False, timestamp=3, ext_hook=decode_extra
+            )
+        except (ValueError, TypeError, msgpack.UnpackException) as exc:
+            raise ParseError(f"MessagePack parse error - {exc}")
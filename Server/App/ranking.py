@@ -0,0 +1,108 @@
+"""
+Lexicographic rank keys for manual task ordering
+
+Tasks are ordered by a string ``rank`` compared byte-wise (as MongoDB does),
+so a new key can always be generated between two neighbours and moving a
+task only rewrites that task.
+"""
+
+import random
+from typing import List, Optional
+
+# Base-62 digits in ASCII order, so string order matches numeric order
+DIGITS = '0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz'
+BASE = len(DIGITS)
+
+
+def _midpoint(lower: str, upper: Optional[str]) -> str:
+    """Key strictly between ``lower`` ('' = start) and ``upper`` (None = end)"""
+    if upper is not None:
+        # Skip the shared prefix, treating missing lower digits as '0'
+        n = 0
+        while n < len(upper) and (lower[n] if n < len(lower) else '0') == upper[n]:
+            n += 1
+        if n > 0:
+            return upper[:n] + _midpoint(lower[n:], upper[n:])
+
+    digit_lower = DIGITS.index(lower[0]) if lower else 0
+    digit_upper = DIGITS.index(upper[0]) if upper is not None else BASE
+    if digit_upper - digit_lower > 1:
+        return DIGITS[(digit_lower + digit_upper) // 2]
+
+    # Adjacent digits: keep the lower digit and go one level deeper
+    if upper is not None and len(upper) > 1:
+        return upper[0]
+    return DIGITS[digit_lower] + _midpoint(lower[1:], None)
+
+
+def _rank_before(upper: str) -> str:
+    """Key just ahead of ``upper``, stepping one digit so keys grow slowly"""
+    digit = DIGITS.index(upper[0])
+    if digit > 1:
+        return DIGITS[digit - 1]
+    if digit == 1:
+        return DIGITS[0] + DIGITS[-1]
+    return DIGITS[0] + _rank_before(upper[1:])
+
+
+def _rank_after(lower: str) -> str:
+    """Key just behind ``lower``, stepping one digit so keys grow slowly"""
+    if not lower:
+        return DIGITS[1]
+    digit = DIGITS.index(lower[0])
+    if digit < BASE - 1:
+        return DIGITS[digit + 1]
+    return DIGITS[-1] + _rank_after(lower[1:])
+
+
+def _with_tiebreaker(rank: str, after: Optional[str]) -> str:
+    """Append a random digit, keeping ``rank`` < result < ``after``"""
+    limit = BASE
+    if after is not None and after.startswith(rank):
+        limit = DIGITS.index(after[len(rank)])
+    if limit <= 1:
+        return rank
+    return rank + DIGITS[random.randrange(1, limit)]
+
+
+def rank_between(before: Optional[str], after: Optional[str], tiebreak: bool = False) -> str:
+    """
+    Return a rank that sorts after ``before`` and before ``after``.
+
+    Either bound may be None to mean the start or end of the list.
+    With ``tiebreak``, a random digit is appended so concurrent writers
+    filling the same gap almost never produce the same key.
+    Raises ValueError if the bounds are out of order or malformed.
+    """
+    for key in (before, after):
+        if key is not None and (not key or key.endswith('0') or key.strip(DIGITS)):
+            raise ValueError(f"Invalid rank key: {key!r}")
+    if before is not None and after is not None and before >= after:
+        raise ValueError("'before' rank must sort ahead of 'after' rank")
+    # Inserting at either end is the common case (new tasks go on top)
+    if before is None and after is not None:
+        rank = _rank_before(after)
+    elif after is None and before is not None:
+        rank = _rank_after(before)
+    else:
+        rank = _midpoint(before or '', after)
+    return _with_tiebreaker(rank, after) if tiebreak else rank
+
+
+def evenly_spaced_ranks(count: int) -> List[str]:
+    """Return ``count`` short, evenly spaced ascending ranks (used for rebalancing)"""
+    width = 1
+    while BASE ** width <= count:
+        width += 1
+    step = BASE ** width // (count + 1)
+
+    ranks = []
+    for i in range(1, count + 1):
+        value = i * step
+        digits = []
+        for _ in range(width):
+            value, remainder = divmod(value, BASE)
+            digits.append(DIGITS[remainder])
+        # Trailing zeros are dropped so every key stays a valid midpoint bound
+        ranks.append(''.join(reversed(digits)).rstrip('0'))
+    return ranks
@@ -0,0 +1,236 @@
+"""
+Due-date reminder scheduler for TaskFlow
+
+An in-process scheduler that keeps only the reminders due within the next
+window in a heap, sleeps until the earliest one, and is kept current by the
+task_saved / task_deleted signals instead of rescanning the collection.
+Each reminder is claimed atomically (``reminded_at``) before delivery, so
+it is delivered at most once even with several worker processes.
+"""
+
+import heapq
+import json
+import logging
+import threading
+import urllib.request
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .signals import task_saved, task_deleted
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': False,
+    'SINK': 'App.reminders.LogReminderSink',
+    'WINDOW_SECONDS': 3600,  # how far ahead reminders are loaded
+    'BATCH_SIZE': 500,       # max reminders loaded per refill
+    'WEBHOOK_URL': '',
+    'WEBHOOK_TIMEOUT': 5,
+}
+
+
+def get_config(key):
+    """Read a TASK_REMINDERS setting, falling back to DEFAULTS"""
+    return getattr(settings, 'TASK_REMINDERS', {}).get(key, DEFAULTS[key])
+
+
+class LogReminderSink:
+    """Delivers reminders to the application log"""
+
+    def deliver(self, task: Dict):
+        logger.info(f"⏰ Reminder: task {task['id']} '{task['title']}' for user {task['user_id']} is due")
+
+
+class WebhookReminderSink:
+    """Stub webhook delivery: POSTs the task as JSON to TASK_REMINDERS['WEBHOOK_URL']"""
+
+    def deliver(self, task: Dict):
+        body = json.dumps({'event': 'task.due', 'task': task}, default=str).encode()
+        request = urllib.request.Request(
+            get_config('WEBHOOK_URL'), data=body, method='POST',
+            headers={'Content-Type': 'application/json'},
+        )
+        with urllib.request.urlopen(request, timeout=get_config('WEBHOOK_TIMEOUT')):
+            pass
+
+
+class ReminderScheduler:
+    """Heap of upcoming reminders with incremental refills"""
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._heap = []      # (due_at, task_id)
+        self._due = {}       # task_id -> due_at; heap entries not matching are stale
+        self._window_end = None
+        self._refilling = False
+        self._changed_during_refill = {}
+        self._thread = None
+        self._stopping = False
+        self.delivered = 0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        """Start the scheduler thread and begin listening for task changes"""
+        if self.running:
+            return
+        self._stopping = False
+        task_saved.connect(self._on_task_saved, dispatch_uid='reminder_scheduler_saved')
+        task_deleted.connect(self._on_task_deleted, dispatch_uid='reminder_scheduler_deleted')
+        self._thread = threading.Thread(target=self._run, name='reminder-scheduler', daemon=True)
+        self._thread.start()
+        logger.info("Reminder scheduler started")
+
+    def stop(self):
+        task_saved.disconnect(dispatch_uid='reminder_scheduler_saved')
+        task_deleted.disconnect(dispatch_uid='reminder_scheduler_deleted')
+        with self._condition:
+            self._stopping = True
+            self._condition.notify()
+
+    # -- incremental updates from TaskService --
+
+    def _on_task_saved(self, sender, task, **kwargs):
+        due_at = None if task.get('completed') else task.get('due_at')
+        self._track(task['id'], due_at)
+
+    def _on_task_deleted(self, sender, task_id, **kwargs):
+        self._track(task_id, None)
+
+    def _track(self, task_id: str, due_at: Optional[datetime]):
+        with self._condition:
+            if self._refilling:
+                self._changed_during_refill[task_id] = due_at
+            if due_at is None or self._window_end is None or due_at > self._window_end:
+                # Not (or no longer) due within the loaded window
+                self._due.pop(task_id, None)
+                return
+            self._due[task_id] = due_at
+            heapq.heappush(self._heap, (due_at, task_id))
+            self._condition.notify()
+
+    # -- scheduler loop --
+
+    def _run(self):
+        while True:
+            with self._condition:
+                if self._stopping:
+                    return
+                now = datetime.utcnow()
+                needs_refill = self._window_end is None or now >= self._window_end
+
+            if needs_refill:
+                try:
+                    self._refill()
+                except Exception as e:
+                    logger.error(f"Reminder refill failed: {e}")
+                    with self._condition:
+                        self._condition.wait(timeout=30)
+                    continue
+
+            for task_id, due_at in self._pop_due():
+                self._deliver(task_id, due_at)
+
+            with self._condition:
+                if self._stopping:
+                    return
+                now = datetime.utcnow()
+                wake_at = self._window_end
+                if self._heap and self._heap[0][0] < wake_at:
+                    wake_at = self._heap[0][0]
+                timeout = max(0.0, (wake_at - now).total_seconds())
+                if timeout > 0:
+                    self._condition.wait(timeout=timeout)
+
+    def _refill(self):
+        """Load reminders due before the end of the next window"""
+        from .mongodb_service import mongodb_service
+
+        with self._condition:
+            self._refilling = True
+            self._changed_during_refill = {}
+
+        try:
+            now = datetime.utcnow()
+            window_end = now + timedelta(seconds=get_config('WINDOW_SECONDS'))
+            batch_size = get_config('BATCH_SIZE')
+            # Served by the partial open_due_at index ($type repeats its filter
+            # so the planner can prove the query is covered by it)
+            docs = list(mongodb_service.tasks_collection.find(
+                {'completed': False, 'due_at': {'$lte': window_end, '$type': 'date'}, 'reminded_at': None},
+                {'due_at': 1},
+            ).sort('due_at', 1).limit(batch_size))
+            if len(docs) == batch_size:
+                # Window is fuller than one batch; stop it at the last loaded reminder
+                window_end = docs[-1]['due_at']
+        except Exception:
+            with self._condition:
+                self._refilling = False
+            raise
+
+        with self._condition:
+            self._due = {str(doc['_id']): doc['due_at'] for doc in docs}
+            self._window_end = window_end
+            # Changes that raced with the query win over what it returned
+            for task_id, due_at in self._changed_during_refill.items():
+                if due_at is None or due_at > window_end:
+                    self._due.pop(task_id, None)
+                else:
+                    self._due[task_id] = due_at
+            self._heap = [(due_at, task_id) for task_id, due_at in self._due.items()]
+            heapq.heapify(self._heap)
+            self._refilling = False
+        logger.debug(f"Loaded {len(docs)} reminders due before {window_end.isoformat()}")
+
+    def _pop_due(self):
+        """Remove and return (task_id, due_at) pairs whose time has come"""
+        ready = []
+        with self._condition:
+            now = datetime.utcnow()
+            while self._heap and self._heap[0][0] <= now:
+                due_at, task_id = heapq.heappop(self._heap)
+                if self._due.get(task_id) == due_at:  # skip stale entries
+                    del self._due[task_id]
+                    ready.append((task_id, due_at))
+        return ready
+
+    def _deliver(self, task_id: str, due_at: datetime):
+        """Claim the reminder, then hand it to the sink (at most once)"""
+        from bson import ObjectId
+        from pymongo import ReturnDocument
+        from .mongodb_service import mongodb_service, task_service
+
+        try:
+            task = mongodb_service.tasks_collection.find_one_and_update(
+                {'_id': ObjectId(task_id), 'completed': False, 'due_at': due_at, 'reminded_at': None},
+                {'$set': {'reminded_at': datetime.utcnow()}},
+                return_document=ReturnDocument.AFTER,
+            )
+        except Exception as e:
+            logger.error(f"Could not claim reminder for task {task_id}: {e}")
+            return
+        if task is None:
+            return  # completed, rescheduled or claimed by another process
+
+        try:
+            import_string(get_config('SINK'))().deliver(task_service._format_task(task))
+            self.delivered += 1
+        except Exception as e:
+            # Already claimed: the reminder is dropped rather than sent twice
+            logger.error(f"Reminder delivery failed for task {task_id}: {e}")
+
+
+# Global scheduler; started from wsgi/asgi when TASK_REMINDERS['ENABLED']
+reminder_scheduler = ReminderScheduler()
+
+
+def start_reminder_scheduler():
+    """Start the scheduler if reminders are enabled in settings"""
+    if get_config('ENABLED'):
+        reminder_scheduler.start()
@@ -0,0 +1,50 @@
+"""
+MessagePack renderer for TaskFlow API clients
+Negotiated via ``Accept: application/msgpack``
+"""
+
+import datetime
+import decimal
+import uuid
+
+import msgpack
+from bson import ObjectId
+from django.utils.encoding import force_str
+from django.utils.functional import Promise
+from rest_framework.renderers import BaseRenderer
+
+# MessagePack extension type codes used by the API (-1 is the built-in timestamp)
+OBJECTID_EXT_TYPE = 1
+
+
+def encode_extra(obj):
+    """msgpack ``default`` hook for types that have no native MessagePack form"""
+    if isinstance(obj, datetime.datetime):
+        # Mongo hands back naive UTC datetimes; pack them as native timestamps
+        if obj.tzinfo is None:
+            obj = obj.replace(tzinfo=datetime.timezone.utc)
+        return msgpack.Timestamp.from_datetime(obj)
+    if isinstance(obj, ObjectId):
+        return msgpack.ExtType(OBJECTID_EXT_TYPE, obj.binary)
+    if isinstance(obj, Promise):
+        return force_str(obj)
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    if isinstance(obj, (decimal.Decimal, uuid.UUID)):
+        return str(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not MessagePack serializable")
+
+
+class MessagePackRenderer(BaseRenderer):
+    """Renderer which serializes to MessagePack"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_extra, use_bin_type=True, datetime=True)
@@ -0,0 +1,219 @@
+"""
+Resilience layer for MongoDB calls
+Circuit breaker, per-operation deadlines and bounded read retries
+"""
+
+import functools
+import logging
+import random
+import threading
+import time
+from typing import Dict
+
+from django.conf import settings
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'FAILURE_THRESHOLD': 5,   # consecutive failures before the breaker opens
+    'RESET_TIMEOUT': 30.0,    # seconds to stay open before a trial call
+    'READ_RETRIES': 2,        # extra attempts for idempotent reads
+    'RETRY_BACKOFF': 0.1,     # base delay (seconds) for jittered backoff
+    'READ_DEADLINE': 5.0,     # total seconds a read may spend, retries included
+    'WRITE_DEADLINE': 5.0,    # total seconds a write may spend
+}
+
+# Breakers by name, for health reporting
+BREAKERS: Dict[str, 'CircuitBreaker'] = {}
+
+_local = threading.local()
+
+
+def current_operation():
+    """Name of the guarded service method running on this thread, if any"""
+    return getattr(_local, 'operation', None)
+
+
+def remaining_ms() -> int:
+    """
+    Milliseconds left before the running guarded operation's deadline.
+
+    Passed to Mongo as maxTimeMS so the server aborts a slow attempt
+    (ExecutionTimeout) instead of letting it outlive the deadline. Outside
+    a guarded call the READ_DEADLINE is used.
+    """
+    deadline = getattr(_local, 'deadline', None)
+    if deadline is None:
+        return int(get_config('READ_DEADLINE') * 1000)
+    return max(1, int((deadline - time.monotonic()) * 1000))
+
+
+def get_config(key):
+    """Read a MONGODB_RESILIENCE setting, falling back to DEFAULTS"""
+    return getattr(settings, 'MONGODB_RESILIENCE', {}).get(key, DEFAULTS[key])
+
+
+class DatabaseUnavailable(APIException):
+    """Raised instead of waiting on an unreachable database; rendered as 503 + Retry-After"""
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Database temporarily unavailable, please retry later.'
+    default_code = 'database_unavailable'
+
+    def __init__(self, detail=None, code=None, wait=None):
+        super().__init__(detail, code)
+        # DRF's exception handler turns `wait` into a Retry-After header
+        self.wait = max(1, int(wait)) if wait else 1
+
+
+def is_transient(exc: Exception) -> bool:
+    """Whether an exception means the server is unreachable or too slow"""
+    from pymongo.errors import ConnectionFailure, ExecutionTimeout
+    return isinstance(exc, (ConnectionFailure, ExecutionTimeout))
+
+
+class CircuitBreaker:
+    """
+    Classic closed / open / half-open circuit breaker.
+
+    After FAILURE_THRESHOLD consecutive transient failures the breaker opens
+    and calls fail immediately. Once RESET_TIMEOUT has passed a single trial
+    call is let through; its outcome closes or re-opens the breaker.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, name: str):
+        self.name = name
+        self._lock = threading.Lock()
+        self.reset()
+        BREAKERS[name] = self
+
+    def reset(self):
+        """Close the breaker and clear its counters"""
+        with self._lock:
+            self._state = self.CLOSED
+            self._consecutive_failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+            self._counters = {'successes': 0, 'failures': 0, 'rejected': 0, 'opened': 0}
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            return self._state
+
+    def retry_after(self) -> float:
+        """Seconds until the breaker will allow a trial call"""
+        reset_timeout = get_config('RESET_TIMEOUT')
+        if self._opened_at is None:
+            return reset_timeout
+        return max(0.0, reset_timeout - (time.monotonic() - self._opened_at))
+
+    def before_call(self):
+        """Raise DatabaseUnavailable if the call must not reach the database"""
+        with self._lock:
+            if self._state == self.OPEN and self.retry_after() <= 0:
+                self._state = self.HALF_OPEN
+                self._trial_in_flight = False
+                logger.info(f"Circuit '{self.name}' half-open, allowing a trial call")
+
+            if self._state == self.OPEN or (self._state == self.HALF_OPEN and self._trial_in_flight):
+                self._counters['rejected'] += 1
+                raise DatabaseUnavailable(wait=self.retry_after() or get_config('RESET_TIMEOUT'))
+
+            if self._state == self.HALF_OPEN:
+                self._trial_in_flight = True
+
+    def record_success(self):
+        with self._lock:
+            self._counters['successes'] += 1
+            self._consecutive_failures = 0
+            self._trial_in_flight = False
+            if self._state != self.CLOSED:
+                logger.info(f"Circuit '{self.name}' closed")
+            self._state = self.CLOSED
+            self._opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self._counters['failures'] += 1
+            self._consecutive_failures += 1
+            self._trial_in_flight = False
+            if self._state == self.HALF_OPEN or (
+                self._state == self.CLOSED
+                and self._consecutive_failures >= get_config('FAILURE_THRESHOLD')
+            ):
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+                self._counters['opened'] += 1
+                logger.warning(
+                    f"Circuit '{self.name}' opened after "
+                    f"{self._consecutive_failures} consecutive failures"
+                )
+
+    def snapshot(self) -> Dict:
+        """Current state and counters, for health checks"""
+        with self._lock:
+            return {
+                'state': self._state,
+                'consecutive_failures': self._consecutive_failures,
+                'retry_after': round(self.retry_after(), 1) if self._state != self.CLOSED else 0,
+                **self._counters,
+            }
+
+
+mongodb_breaker = CircuitBreaker('mongodb')
+
+
+def guarded(operation: str, idempotent: bool = False, breaker: CircuitBreaker = mongodb_breaker):
+    """
+    Run a service method behind the circuit breaker.
+
+    Transient failures (server unreachable, timeouts) become
+    DatabaseUnavailable. Idempotent reads are retried with full-jitter
+    exponential backoff until READ_RETRIES or the deadline runs out; writes
+    are never retried. Service methods pass remaining_ms() to Mongo so a
+    single attempt cannot run past the deadline either. Nested guarded
+    calls run unguarded so only the outermost call is counted and retried.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, 'active', False):
+                return func(*args, **kwargs)
+
+            retries = get_config('READ_RETRIES') if idempotent else 0
+            deadline = time.monotonic() + get_config('READ_DEADLINE' if idempotent else 'WRITE_DEADLINE')
+            attempt = 0
+            while True:
+                breaker.before_call()
+                _local.active = True
+                _local.operation = operation
+                _local.deadline = deadline
+                try:
+                    result = func(*args, **kwargs)
+                except Exception as e:
+                    if not is_transient(e):
+                        breaker.record_success()
+                        raise
+                    breaker.record_failure()
+                    delay = random.uniform(0, get_config('RETRY_BACKOFF') * 2 ** attempt)
+                    attempt += 1
+                    if attempt > retries or time.monotonic() + delay >= deadline:
+                        logger.error(f"MongoDB {operation} failed after {attempt} attempt(s): {e}")
+                        wait = breaker.retry_after() if breaker.state == breaker.OPEN else None
+                        raise DatabaseUnavailable(wait=wait) from e
+                    logger.warning(f"MongoDB {operation} failed, retrying in {delay:.2f}s: {e}")
+                    time.sleep(delay)
+                    continue
+                finally:
+                    _local.active = False
+                    _local.operation = None
+                    _local.deadline = None
+                breaker.record_success()
+                return result
+        return wrapper
+    return decorator
@@ -0,0 +1,214 @@
+"""
+Task search helpers for TaskFlow
+
+Shared tokenizer, highlighting and cursor encoding for task search, plus
+the in-process inverted index used when MongoDB text indexes are not
+available (TASK_SEARCH['BACKEND'] = 'memory', or no text index found).
+"""
+
+import base64
+import json
+import math
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from django.conf import settings
+
+from .signals import task_saved, task_deleted
+
+DEFAULTS = {
+    'BACKEND': 'mongo',          # one of BACKENDS
+    'MEMORY_MAX_USERS': 1000,    # per-user indexes kept in memory (LRU)
+    'MEMORY_INDEX_TTL': 60,      # seconds before a user's index is rebuilt
+    'SNIPPET_LENGTH': 160,
+}
+
+# 'mongo' uses the user_text index, 'memory' the in-process BM25 index
+BACKENDS = ('mongo', 'memory')
+
+# Same relative weighting as the MongoDB text index
+FIELD_WEIGHTS = {'title': 3, 'description': 1}
+
+STOPWORDS = frozenset(
+    'a an and are as at be but by for from has have i if in into is it its of on or '
+    'so that the their then there these they this to was were will with'.split()
+)
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+def get_config(key):
+    """Read a TASK_SEARCH setting, falling back to DEFAULTS"""
+    return getattr(settings, 'TASK_SEARCH', {}).get(key, DEFAULTS[key])
+
+
+def stem(word: str) -> str:
+    """Very light English suffix stripping, close enough to match Mongo's stemmer"""
+    for suffix in ('ing', 'ed', 'es', 's'):
+        if len(word) > len(suffix) + 2 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased, stemmed terms of ``text`` without stopwords"""
+    return [
+        stem(word) for word in TOKEN_RE.findall((text or '').lower())
+        if word not in STOPWORDS
+    ]
+
+
+def highlight(text: str, terms: List[str], snippet_length: Optional[int] = None) -> Dict:
+    """
+    Locate query terms in ``text``.
+
+    Returns the text (or a snippet around the first match when
+    ``snippet_length`` is given) and [start, end] offsets of every match
+    within it. Offsets rather than markup keep rendering safe on clients.
+    """
+    text = text or ''
+    wanted = set(terms)
+    matches = [
+        [m.start(), m.end()] for m in TOKEN_RE.finditer(text)
+        if stem(m.group().lower()) in wanted
+    ]
+    if snippet_length and len(text) > snippet_length:
+        start = max(0, matches[0][0] - snippet_length // 4) if matches else 0
+        end = start + snippet_length
+        text = text[start:end]
+        matches = [[s - start, e - start] for s, e in matches if s >= start and e <= end]
+    return {'text': text, 'matches': matches}
+
+
+def encode_cursor(score: float, task_id: str) -> str:
+    """Opaque pagination cursor for the last result of a page"""
+    return base64.urlsafe_b64encode(json.dumps([score, task_id]).encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str) -> Tuple[float, str]:
+    """Inverse of encode_cursor; raises ValueError for malformed cursors"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        score, task_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return float(score), str(task_id)
+    except Exception:
+        raise ValueError("Invalid search cursor")
+
+
+class UserIndex:
+    """
+    BM25 inverted index over one user's tasks.
+
+    Not thread-safe by itself: MemorySearchIndex holds ``lock`` around
+    every read and mutation.
+    """
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self, tasks: List[Dict]):
+        self.built_at = time.monotonic()
+        self.lock = threading.Lock()
+        self.postings = defaultdict(dict)   # term -> {task_id: weighted tf}
+        self.lengths = {}                   # task_id -> weighted length
+        self.tasks = {}
+        for task in tasks:
+            self.add(task)
+
+    def add(self, task: Dict):
+        self.remove(task['id'])
+        counts = defaultdict(int)
+        for field, weight in FIELD_WEIGHTS.items():
+            for term in tokenize(task.get(field)):
+                counts[term] += weight
+        for term, count in counts.items():
+            self.postings[term][task['id']] = count
+        self.lengths[task['id']] = sum(counts.values())
+        self.tasks[task['id']] = task
+
+    def remove(self, task_id: str):
+        if task_id not in self.tasks:
+            return
+        for term in tokenize(self.tasks[task_id].get('title')) + tokenize(self.tasks[task_id].get('description')):
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(task_id, None)
+                if not postings:
+                    del self.postings[term]
+        del self.lengths[task_id]
+        del self.tasks[task_id]
+
+    def search(self, terms: List[str]) -> List[Tuple[float, str]]:
+        """(score, task_id) for tasks matching any term, best first"""
+        count = len(self.tasks)
+        if not count:
+            return []
+        average_length = sum(self.lengths.values()) / count or 1
+        scores = defaultdict(float)
+        for term in set(terms):
+            postings = self.postings.get(term, {})
+            if not postings:
+                continue
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            for task_id, tf in postings.items():
+                norm = self.K1 * (1 - self.B + self.B * self.lengths[task_id] / average_length)
+                scores[task_id] += idf * tf * (self.K1 + 1) / (tf + norm)
+        return sorted(((round(score, 6), task_id) for task_id, score in scores.items()),
+                      key=lambda item: (-item[0], item[1]))
+
+
+class MemorySearchIndex:
+    """LRU of per-user indexes, kept current through task signals"""
+
+    def __init__(self):
+        self._indexes = OrderedDict()
+        self._lock = threading.Lock()
+        task_saved.connect(self._on_task_saved, dispatch_uid='memory_search_saved')
+        task_deleted.connect(self._on_task_deleted, dispatch_uid='memory_search_deleted')
+
+    def search(self, user_id: str, terms: List[str], loader) -> List[Tuple[float, Dict]]:
+        """(score, task) for the user's tasks matching any term, best first"""
+        index = self._get(user_id, loader)
+        # Signal handlers mutate the index from other request threads
+        with index.lock:
+            return [(score, index.tasks[task_id]) for score, task_id in index.search(terms)]
+
+    def _get(self, user_id: str, loader) -> UserIndex:
+        """The user's index, built with ``loader(user_id)`` when missing or stale"""
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None and time.monotonic() - index.built_at < get_config('MEMORY_INDEX_TTL'):
+                self._indexes.move_to_end(user_id)
+                return index
+
+        # Other workers' writes are only seen after a rebuild, hence the TTL
+        index = UserIndex(loader(user_id))
+        with self._lock:
+            self._indexes[user_id] = index
+            self._indexes.move_to_end(user_id)
+            while len(self._indexes) > get_config('MEMORY_MAX_USERS'):
+                self._indexes.popitem(last=False)
+        return index
+
+    def clear(self):
+        with self._lock:
+            self._indexes.clear()
+
+    def _on_task_saved(self, sender, task, **kwargs):
+        with self._lock:
+            index = self._indexes.get(task['user_id'])
+            if index is not None:
+                with index.lock:
+                    index.add(task)
+
+    def _on_task_deleted(self, sender, task_id, user_id, **kwargs):
+        with self._lock:
+            index = self._indexes.get(user_id)
+            if index is not None:
+                with index.lock:
+                    index.remove(task_id)
+
+
+memory_search_index = MemorySearchIndex()
@@ -0,0 +1,16 @@
+"""
+Task change signals for TaskFlow
+
+Sent by TaskService after a write succeeds, so in-process consumers (the
+reminder scheduler and friends) can react without TaskService knowing
+about them. Sent with ``send_robust``: a failing receiver is logged and
+never fails the write.
+"""
+
+from django.dispatch import Signal
+
+# kwargs: task (formatted task dict), created (bool)
+task_saved = Signal()
+
+# kwargs: task_id (str), user_id (str)
+task_deleted = Signal()
@@ -0,0 +1,84 @@
+"""
+Single-flight coalescing of identical reads for TaskService
+
+Concurrent callers asking for the same key share one execution: the first
+caller runs the query, the rest wait for it and receive the same result (or
+exception). Nothing is cached once the call returns. Writes invalidate a
+user's in-flight entries so that readers arriving after a write never join
+a query that started before it.
+"""
+
+import threading
+from typing import Callable, Dict, Hashable, Tuple
+
+
+class _Call:
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Per-process single-flight group; keys are ``(user_id, ...)`` tuples"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[Tuple, _Call] = {}
+        self.executed = 0     # calls that ran the query
+        self.shared = 0       # calls served by another caller's query
+        self.invalidated = 0  # in-flight entries dropped by writes
+
+    def do(self, key: Tuple[Hashable, ...], func: Callable):
+        """
+        Run ``func()`` unless an identical call is in flight, then share its outcome.
+
+        The result is shared between callers as-is and must not be mutated.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.executed += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+            return call.result
+        except BaseException as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.done.set()
+
+    def forget(self, user_id: str):
+        """Stop new callers from joining the user's in-flight calls"""
+        with self._lock:
+            stale = [key for key in self._calls if key[0] == user_id]
+            for key in stale:
+                del self._calls[key]
+            self.invalidated += len(stale)
+
+    def snapshot(self) -> Dict:
+        """Counters for /api/health/: how many queries coalescing saved"""
+        with self._lock:
+            total = self.executed + self.shared
+            return {
+                'executed': self.executed,
+                'shared': self.shared,
+                'saved_ratio': round(self.shared / total, 3) if total else 0.0,
+                'invalidated': self.invalidated,
+                'in_flight': len(self._calls),
+            }
@@ -0,0 +1,262 @@
+"""
+Slow MongoDB operation recorder for TaskFlow
+
+Registered as a PyMongo command listener. Commands slower than the
+threshold are recorded with their filter shape (values redacted), the
+TaskService/UserService method that issued them, the documents returned
+and, for a sample of reads, an ``explain('executionStats')`` summary.
+Records are written to a capped collection by a background thread so the
+request that ran the slow query does not pay for it twice.
+"""
+
+import json
+import logging
+import queue
+import random
+import threading
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from pymongo import monitoring
+
+from .resilience import current_operation
+
+logger = logging.getLogger(__name__)
+
+DEFAULTS = {
+    'ENABLED': True,
+    'THRESHOLD_MS': 100,
+    'EXPLAIN_SAMPLE_RATE': 0.1,
+    'COLLECTION': 'slow_queries',
+    'COLLECTION_SIZE_BYTES': 16 * 1024 * 1024,
+}
+
+# Commands worth recording, and the subset that can be safely re-run as explain
+RECORDED_COMMANDS = {'find', 'aggregate', 'count', 'distinct', 'findAndModify', 'update', 'delete'}
+EXPLAINABLE_COMMANDS = {'find', 'aggregate', 'count', 'distinct'}
+
+# Driver-added command fields that must not be sent back in an explain
+DRIVER_FIELDS = {'lsid', 'txnNumber', 'readConcern', 'writeConcern'}
+
+
+def get_config(key):
+    """Read a SLOW_QUERY_LOG setting, falling back to DEFAULTS"""
+    return getattr(settings, 'SLOW_QUERY_LOG', {}).get(key, DEFAULTS[key])
+
+
+def query_shape(value):
+    """Replace every literal in a filter with '?', keeping field names and operators"""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [query_shape(item) for item in value]
+        # Collapse lists of literals ($in: [...]) to a single placeholder
+        if all(shape == '?' for shape in shapes):
+            return ['?'] if shapes else []
+        return shapes
+    return '?'
+
+
+def command_filter(command: Dict) -> Dict:
+    """The query part of a command, whichever command it is"""
+    name = next(iter(command))
+    if name in ('find', 'count', 'distinct', 'findAndModify'):
+        return command.get('filter') or command.get('query') or {}
+    if name == 'aggregate':
+        stages = command.get('pipeline') or [{}]
+        return stages[0].get('$match', {}) if stages else {}
+    if name in ('update', 'delete'):
+        statements = command.get('updates') or command.get('deletes') or [{}]
+        return statements[0].get('q', {})
+    return {}
+
+
+def documents_returned(command_name: str, reply: Dict) -> Optional[int]:
+    """Number of documents in a command reply (first batch for cursors)"""
+    if 'cursor' in reply:
+        return len(reply['cursor'].get('firstBatch', []))
+    if command_name == 'findAndModify':
+        return 1 if reply.get('value') else 0
+    if 'n' in reply:
+        return reply['n']
+    if 'values' in reply:
+        return len(reply['values'])
+    return None
+
+
+def summarize_explain(explain: Dict) -> Dict:
+    """Keep the parts of explain('executionStats') needed to spot bad plans"""
+    stats = explain.get('executionStats', {})
+    planner = explain.get('queryPlanner', {})
+    if not planner and 'stages' in explain:  # aggregate explain
+        planner = explain['stages'][0].get('$cursor', {}).get('queryPlanner', {})
+        stats = explain['stages'][0].get('$cursor', {}).get('executionStats', stats)
+
+    stages = []
+    plan = planner.get('winningPlan', {})
+    while plan:
+        stages.append(plan.get('stage'))
+        if plan.get('indexName'):
+            stages[-1] += f"({plan['indexName']})"
+        plan = plan.get('inputStage') or (plan.get('inputStages') or [None])[0]
+
+    return {
+        'plan': stages,
+        'collscan': any(stage and stage.startswith('COLLSCAN') for stage in stages),
+        'keys_examined': stats.get('totalKeysExamined'),
+        'docs_examined': stats.get('totalDocsExamined'),
+        'returned': stats.get('nReturned'),
+        'execution_ms': stats.get('executionTimeMillis'),
+    }
+
+
+class SlowQueryRecorder(monitoring.CommandListener):
+    """PyMongo command listener that records commands above THRESHOLD_MS"""
+
+    def __init__(self, max_pending: int = 1000):
+        self._started = {}
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=max_pending)
+        self._worker = None
+        self._db = None
+        self.dropped = 0
+
+    def bind(self, db):
+        """Set the database records are written to (called once connected)"""
+        self._db = db
+
+    # -- listener callbacks (run on the thread that issued the command) --
+
+    def started(self, event):
+        if event.command_name not in RECORDED_COMMANDS or not get_config('ENABLED'):
+            return
+        if event.command.get(event.command_name) == get_config('COLLECTION'):
+            return
+        with self._lock:
+            if len(self._started) < 10000:
+                self._started[(event.connection_id, event.request_id)] = (
+                    event.command, event.database_name, current_operation()
+                )
+
+    def succeeded(self, event):
+        with self._lock:
+            started = self._started.pop((event.connection_id, event.request_id), None)
+        if started is None:
+            return
+        duration_ms = event.duration_micros / 1000
+        if duration_ms < get_config('THRESHOLD_MS'):
+            return
+
+        command, database_name, operation = started
+        shape = query_shape(command_filter(command))
+        record = {
+            'at': datetime.utcnow(),
+            'operation': operation,
+            'command': event.command_name,
+            'database': database_name,
+            'collection': command.get(event.command_name),
+            'shape': shape,
+            'shape_key': json.dumps(shape, sort_keys=True, default=str),
+            'sort': command.get('sort'),
+            'duration_ms': round(duration_ms, 2),
+            'docs_returned': documents_returned(event.command_name, event.reply),
+            'explain': None,
+        }
+        explain_command = None
+        if (event.command_name in EXPLAINABLE_COMMANDS
+                and random.random() < get_config('EXPLAIN_SAMPLE_RATE')):
+            explain_command = {
+                key: value for key, value in command.items()
+                if not key.startswith('$') and key not in DRIVER_FIELDS
+            }
+        self._enqueue(record, explain_command)
+
+    def failed(self, event):
+        with self._lock:
+            self._started.pop((event.connection_id, event.request_id), None)
+
+    # -- background writer --
+
+    def _enqueue(self, record, explain_command):
+        try:
+            self._queue.put_nowait((record, explain_command))
+        except queue.Full:
+            self.dropped += 1
+            return
+        if self._worker is None or not self._worker.is_alive():
+            with self._lock:
+                if self._worker is None or not self._worker.is_alive():
+                    self._worker = threading.Thread(
+                        target=self._run, name='slow-query-recorder', daemon=True
+                    )
+                    self._worker.start()
+
+    def _run(self):
+        collection = None
+        while True:
+            record, explain_command = self._queue.get()
+            try:
+                if self._db is None:
+                    continue
+                if collection is None:
+                    collection = self._capped_collection()
+                if explain_command:
+                    explain = self._db.client[record['database']].command(
+                        'explain', explain_command, verbosity='executionStats'
+                    )
+                    record['explain'] = summarize_explain(explain)
+                collection.insert_one(record)
+            except Exception as e:
+                logger.warning(f"Could not record slow query: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _capped_collection(self):
+        """The capped log collection, created on first use"""
+        from pymongo.errors import CollectionInvalid
+
+        name = get_config('COLLECTION')
+        try:
+            return self._db.create_collection(
+                name, capped=True, size=get_config('COLLECTION_SIZE_BYTES')
+            )
+        except CollectionInvalid:  # already exists
+            return self._db[name]
+
+    def flush(self):
+        """Block until queued records are written (for tests and commands)"""
+        self._queue.join()
+
+
+def worst_query_shapes(db, limit: int = 20, since: Optional[datetime] = None) -> List[Dict]:
+    """Aggregate recorded slow queries by shape, worst total time first"""
+    match = {'at': {'$gte': since}} if since else {}
+    pipeline = [
+        {'$match': match},
+        {'$group': {
+            '_id': {
+                'collection': '$collection',
+                'command': '$command',
+                'shape_key': '$shape_key',
+            },
+            'operations': {'$addToSet': '$operation'},
+            'count': {'$sum': 1},
+            'total_ms': {'$sum': '$duration_ms'},
+            'avg_ms': {'$avg': '$duration_ms'},
+            'max_ms': {'$max': '$duration_ms'},
+            'avg_docs_returned': {'$avg': '$docs_returned'},
+            'explained': {'$sum': {'$cond': [{'$ifNull': ['$explain', False]}, 1, 0]}},
+            'collscans': {'$sum': {'$cond': ['$explain.collscan', 1, 0]}},
+            'max_docs_examined': {'$max': '$explain.docs_examined'},
+            'plans': {'$addToSet': '$explain.plan'},
+            'last_seen': {'$max': '$at'},
+        }},
+        {'$sort': {'total_ms': -1}},
+        {'$limit': limit},
+    ]
+    return list(db[get_config('COLLECTION')].aggregate(pipeline))
+
+
+# Global recorder, registered on the MongoClient in mongodb_service.connect()
+slow_query_recorder = SlowQueryRecorder()
@@ -1,3 +1,803 @@
-from django.test import TestCase
+import gzip
+import io
+import os
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from unittest import mock
 
-# Create your tests here.
+import msgpack
+from bson import ObjectId
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+from django.test import Client, RequestFactory, SimpleTestCase, TestCase, override_settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .auth_backend import MongoDBUser
+from .idempotency import IdempotencyStore, request_fingerprint
+from .jobs import BulkDeleteJob, ExportJob, ImportJob, JobQueue
+from .middleware import CompressionMiddleware
+from .mongodb_service import (
+    LOOKUP_MAX_IDS, MAX_TAG_LENGTH, MAX_TAGS_PER_TASK, TOMBSTONE_TTL, TaskService, decode_sync_token, encode_sync_token,
+    mongodb_service, normalize_tags, task_service,
+)
+from .parsers import MessagePackParser
+from .ranking import rank_between, evenly_spaced_ranks
+from .reminders import ReminderScheduler
+from .renderers import MessagePackRenderer
+from .resilience import BREAKERS, CircuitBreaker, DatabaseUnavailable, guarded, mongodb_breaker, remaining_ms
+from .search import MemorySearchIndex, UserIndex, decode_cursor, encode_cursor, highlight, tokenize
+from .singleflight import SingleFlight
+from .slow_queries import query_shape, summarize_explain
+from .views import JobListCreateView, TaskAnalyticsView, TaskChangesView, TaskDetailView, TaskListCreateView
+
+
+TEST_USER = MongoDBUser({'id': 'user-1', 'username': 'u', 'email': 'u@x.io'})
+
+
+def _api(view, method, path, body=None, headers=None, **kwargs):
+    """Call an APIView as TEST_USER; ``headers`` are WSGI environ keys, ``kwargs`` URL kwargs"""
+    factory = APIRequestFactory()
+    if method == 'get':
+        request = factory.get(path, body, **(headers or {}))
+    else:
+        request = getattr(factory, method)(path, body, format='json', **(headers or {}))
+    force_authenticate(request, TEST_USER)
+    return view.as_view()(request, **kwargs)
+
+
+def _patch_tasks_collection(collection):
+    """Point TaskService (and so task_service) at ``collection``"""
+    return mock.patch.object(TaskService, 'collection', new_callable=mock.PropertyMock, return_value=collection)
+
+
+LAZY_IMPORT_SCRIPT = """
+import sys
+import django
+django.setup()
+from django.urls import get_resolver
+get_resolver().url_patterns
+import App.views
+from App.mongodb_service import mongodb_service
+print('pymongo' in sys.modules, mongodb_service._client is None)
+"""
+
+
+class LazyConnectionTests(SimpleTestCase):
+    def test_loading_views_and_urls_does_not_touch_mongo(self):
+        # A fresh interpreter: this one imported pymongo long ago
+        result = subprocess.run(
+            [sys.executable, '-c', LAZY_IMPORT_SCRIPT],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=60,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'Project.settings'},
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        # No pymongo import means no MongoClient and no network
+        self.assertEqual(result.stdout.split(), ['False', 'True'])
+
+
+class MessagePackTests(SimpleTestCase):
+    def test_naive_datetime_packs_as_utc_timestamp(self):
+        packed = MessagePackRenderer().render({'at': datetime(2026, 1, 2, 3, 4, 5)})
+        self.assertEqual(
+            msgpack.unpackb(packed, timestamp=0)['at'],
+            msgpack.Timestamp.from_datetime(datetime(2026, 1, 2, 3, 4, 5, tzinfo=timezone.utc)),
+        )
+
+    def test_object_id_uses_ext_type_1(self):
+        object_id = ObjectId()
+        packed = MessagePackRenderer().render({'id': object_id})
+        self.assertEqual(msgpack.unpackb(packed)['id'], msgpack.ExtType(1, object_id.binary))
+
+    def test_round_trip_through_the_parser(self):
+        data = {'id': ObjectId(), 'at': datetime(2026, 1, 2, 3, 4, 5), 'tags': ('a', 'b'), 'n': None}
+        parsed = MessagePackParser().parse(io.BytesIO(MessagePackRenderer().render(data)))
+        self.assertEqual(parsed, {**data, 'at': data['at'].replace(tzinfo=timezone.utc), 'tags': ['a', 'b']})
+
+    def test_garbage_is_a_parse_error(self):
+        with self.assertRaises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b'\xc1'))
+
+
+@override_settings(RESPONSE_COMPRESSION_MIN_BYTES=1024)
+class CompressionMiddlewareTests(SimpleTestCase):
+    def _respond(self, size):
+        middleware = CompressionMiddleware(lambda request: HttpResponse(b'x' * size))
+        return middleware(RequestFactory().get('/api/tasks/', HTTP_ACCEPT_ENCODING='gzip'))
+
+    def test_small_responses_are_sent_as_is(self):
+        response = self._respond(1023)
+        self.assertFalse(response.has_header('Content-Encoding'))
+        self.assertEqual(len(response.content), 1023)
+
+    def test_large_responses_are_gzipped(self):
+        response = self._respond(1024)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), b'x' * 1024)
+
+
+class RankingTests(SimpleTestCase):
+    def test_rank_between_sorts_between_neighbours(self):
+        ranks = [rank_between(None, None)]
+        for i in range(500):
+            position = (i * 7) % (len(ranks) + 1)
+            before = ranks[position - 1] if position > 0 else None
+            after = ranks[position] if position < len(ranks) else None
+            rank = rank_between(before, after)
+            if before is not None:
+                self.assertLess(before, rank)
+            if after is not None:
+                self.assertLess(rank, after)
+            ranks.insert(position, rank)
+        self.assertEqual(ranks, sorted(ranks))
+
+    def test_repeated_insert_at_top_grows_slowly(self):
+        rank = None
+        for _ in range(600):
+            rank = rank_between(None, rank)
+        self.assertLessEqual(len(rank), 12)
+
+    def test_rank_between_rejects_out_of_order_bounds(self):
+        with self.assertRaises(ValueError):
+            rank_between('b', 'a')
+
+    def test_tiebreak_stays_between_neighbours(self):
+        for before, after in [(None, '5'), ('4', '5A'), ('4', '41'), ('z', None), (None, None), ('1', '2')]:
+            for _ in range(50):
+                rank = rank_between(before, after, tiebreak=True)
+                if before is not None:
+                    self.assertLess(before, rank)
+                if after is not None:
+                    self.assertLess(rank, after)
+                self.assertFalse(rank.endswith('0'))
+        self.assertGreater(len({rank_between(None, '5', tiebreak=True) for _ in range(50)}), 1)
+
+    def test_move_between_equal_ranks_rebalances_and_retries(self):
+        before_id, after_id, task_id = '0' * 23 + '1', '0' * 23 + '2', '0' * 23 + '3'
+        ranks = {before_id: 'V', after_id: 'V'}  # collided under concurrent writes
+        collection = mock.MagicMock()
+        collection.find.side_effect = lambda query, projection, **kwargs: [
+            {'_id': ObjectId(i), 'rank': ranks[i]} for i in (before_id, after_id)
+        ]
+        collection.find_one_and_update.side_effect = lambda query, update, **kwargs: {
+            '_id': query['_id'], 'title': 't', 'description': '', 'completed': False,
+            'user_id': 'user-1', 'created_at': None, 'updated_at': None, **update['$set'],
+        }
+
+        def rebalance(user_id):
+            ranks.update({before_id: 'F', after_id: 'V'})
+
+        with _patch_tasks_collection(collection), \
+                mock.patch.object(task_service, 'rebalance_ranks', side_effect=rebalance) as rebalance_ranks:
+            task = task_service.move_task(task_id, 'user-1', before_id, after_id)
+
+        rebalance_ranks.assert_called_once_with('user-1')
+        self.assertTrue('F' < task['rank'] < 'V')
+
+    def test_evenly_spaced_ranks_are_sorted_and_unique(self):
+        ranks = evenly_spaced_ranks(1000)
+        self.assertEqual(ranks, sorted(ranks))
+        self.assertEqual(len(set(ranks)), 1000)
+
+
+class SyncTokenTests(SimpleTestCase):
+    def _changes(self, since):
+        return _api(TaskChangesView, 'get', '/api/tasks/changes/', {'since': since})
+
+    def test_token_round_trips_at_millisecond_precision(self):
+        moment = datetime(2026, 1, 2, 3, 4, 5, 678901)
+        self.assertEqual(decode_sync_token(encode_sync_token(moment)), datetime(2026, 1, 2, 3, 4, 5, 678000))
+
+    def test_malformed_token_is_rejected(self):
+        with self.assertRaises(ValueError):
+            decode_sync_token('not a token!')
+        self.assertEqual(self._changes('not a token!').status_code, 400)
+
+    def test_token_older_than_tombstones_is_gone(self):
+        expired = encode_sync_token(datetime.utcnow() - TOMBSTONE_TTL - timedelta(minutes=1))
+        response = self._changes(expired)
+        self.assertEqual(response.status_code, 410)
+        self.assertIn('full resync', response.data['error'])
+
+
+@override_settings(TASK_REMINDERS={'WINDOW_SECONDS': 3600, 'BATCH_SIZE': 3})
+class ReminderSchedulerTests(SimpleTestCase):
+    def setUp(self):
+        self.scheduler = ReminderScheduler()
+        self.now = datetime.utcnow()
+
+    def _refill_with(self, docs, during_query=None):
+        """Run _refill against a collection returning ``docs``, calling ``during_query`` mid-query"""
+        collection = mock.MagicMock()
+
+        def find(query, projection):
+            if during_query:
+                during_query()
+            return collection.cursor
+        collection.find.side_effect = find
+        collection.cursor.sort.return_value.limit.return_value = docs
+        with mock.patch.object(type(mongodb_service), 'tasks_collection',
+                               new_callable=mock.PropertyMock, return_value=collection):
+            self.scheduler._refill()
+
+    def test_track_ignores_reminders_beyond_the_window(self):
+        self.scheduler._window_end = self.now + timedelta(hours=1)
+        self.scheduler._track('later', self.now + timedelta(hours=2))
+        self.scheduler._track('soon', self.now + timedelta(minutes=5))
+        self.assertEqual(list(self.scheduler._due), ['soon'])
+
+    def test_rescheduled_reminder_leaves_a_stale_entry_that_is_skipped(self):
+        self.scheduler._window_end = self.now + timedelta(hours=1)
+        self.scheduler._track('a', self.now - timedelta(minutes=2))
+        self.scheduler._track('a', self.now - timedelta(minutes=1))
+        self.scheduler._track('b', self.now - timedelta(minutes=3))
+        self.scheduler._track('b', None)  # completed
+        self.assertEqual(len(self.scheduler._heap), 3)
+        self.assertEqual(self.scheduler._pop_due(), [('a', self.now - timedelta(minutes=1))])
+        self.assertEqual(self.scheduler._heap, [])
+
+    def test_changes_during_a_refill_win_over_the_query(self):
+        soon = self.now + timedelta(minutes=5)
+        docs = [{'_id': ObjectId('0' * 23 + '1'), 'due_at': soon}]
+
+        def concurrent_writes():
+            self.scheduler._track('0' * 23 + '1', None)  # completed while the query ran
+            self.scheduler._track('new', soon)
+
+        self._refill_with(docs, during_query=concurrent_writes)
+        self.assertEqual(self.scheduler._due, {'new': soon})
+        self.assertEqual(self.scheduler._heap, [(soon, 'new')])
+        self.assertFalse(self.scheduler._refilling)
+
+    def test_full_batch_shrinks_the_window(self):
+        docs = [
+            {'_id': ObjectId(), 'due_at': self.now + timedelta(minutes=minutes)}
+            for minutes in (1, 2, 3)
+        ]
+        self._refill_with(docs)
+        self.assertEqual(self.scheduler._window_end, docs[-1]['due_at'])
+        self.scheduler._track('beyond', self.now + timedelta(minutes=4))
+        self.assertNotIn('beyond', self.scheduler._due)
+
+
+class TagTests(SimpleTestCase):
+    task_id = '0' * 23 + '1'
+
+    def _update(self, collection, **changes):
+        with _patch_tasks_collection(collection):
+            return task_service.update_tags(self.task_id, 'user-1', **changes)
+
+    def test_normalize_strips_drops_empties_and_dedupes_in_order(self):
+        self.assertEqual(normalize_tags([' work ', '', 'home', 'work', '  ']), ['work', 'home'])
+
+    def test_normalize_rejects_invalid_tags(self):
+        for tags in ('work', [1], ['x' * (MAX_TAG_LENGTH + 1)], [f't{i}' for i in range(MAX_TAGS_PER_TASK + 1)]):
+            with self.assertRaises(ValueError, msg=tags):
+                normalize_tags(tags)
+        self.assertEqual(len(normalize_tags([f't{i}' for i in range(MAX_TAGS_PER_TASK)])), MAX_TAGS_PER_TASK)
+
+    def test_add_only_matches_while_there_is_room(self):
+        collection = mock.MagicMock()
+        collection.find_one_and_update.side_effect = lambda query, update, **kwargs: {
+            '_id': query['_id'], 'title': 't', 'description': '', 'completed': False, 'user_id': 'user-1',
+            'tags': ['a', 'b'], 'created_at': None, 'updated_at': None,
+        }
+        task = self._update(collection, add=['a', 'b'], remove=['b', 'c'])
+
+        pull, add = collection.find_one_and_update.call_args_list
+        self.assertEqual(pull.args[1]['$pull'], {'tags': {'$in': ['c']}})  # 'b' is being added back
+        self.assertEqual(add.args[0][f'tags.{MAX_TAGS_PER_TASK - 2}'], {'$exists': False})
+        self.assertEqual(add.args[1]['$addToSet'], {'tags': {'$each': ['a', 'b']}})
+        self.assertEqual(task['tags'], ['a', 'b'])
+
+    def test_full_task_is_a_validation_error_and_missing_task_is_none(self):
+        collection = mock.MagicMock()
+        collection.find_one_and_update.return_value = None
+        collection.find_one.return_value = {'_id': ObjectId(self.task_id)}
+        with self.assertRaises(ValueError):
+            self._update(collection, add=['new'])
+        collection.find_one.return_value = None
+        self.assertIsNone(self._update(collection, add=['new']))
+
+
+class TaskValidationTests(SimpleTestCase):
+    def test_completed_must_be_a_boolean(self):
+        with mock.patch.object(task_service, 'update_task') as update_task, \
+                mock.patch.object(task_service, 'create_task') as create_task:
+            for value in ('false', 0, None):
+                response = _api(TaskDetailView, 'put', '/api/tasks/x/', {'completed': value}, pk='0' * 24)
+                self.assertEqual(response.status_code, 400, value)
+                response = _api(TaskListCreateView, 'post', '/api/tasks/', {'title': 'a', 'completed': value})
+                self.assertEqual(response.status_code, 400, value)
+        update_task.assert_not_called()
+        create_task.assert_not_called()
+
+
+class TaskLookupTests(SimpleTestCase):
+    def test_results_follow_request_order_with_not_found_entries(self):
+        a, b, missing = ('0' * 23 + str(i) for i in range(1, 4))
+        collection = mock.MagicMock()
+        collection.find.return_value = [
+            {'_id': ObjectId(i), 'title': i, 'description': '', 'completed': False, 'user_id': 'user-1',
+             'created_at': None, 'updated_at': None}
+            for i in (a, b)
+        ]
+        with _patch_tasks_collection(collection):
+            tasks = task_service.get_tasks_by_ids([b, 'bad', a, missing, b], 'user-1')
+
+        self.assertEqual([task['id'] for task in tasks], [b, 'bad', a, missing, b])
+        self.assertEqual([task.get('error') for task in tasks],
+                         [None, 'Task not found', None, 'Task not found', None])
+        [query], _ = collection.find.call_args
+        self.assertEqual(query['user_id'], 'user-1')
+        self.assertEqual(set(query['_id']['$in']), {ObjectId(a), ObjectId(b), ObjectId(missing)})
+
+    def test_too_many_ids_are_rejected_before_querying(self):
+        with self.assertRaises(ValueError):
+            task_service.get_tasks_by_ids(['0' * 24] * (LOOKUP_MAX_IDS + 1), 'user-1')
+
+
+class SlowQueryTests(SimpleTestCase):
+    def test_query_shape_redacts_values(self):
+        shape = query_shape({
+            'user_id': 'secret-user',
+            '_id': {'$in': ['a', 'b', 'c']},
+            '$or': [{'title': 'x'}, {'updated_at': {'$gte': 5}}],
+        })
+        self.assertEqual(shape, {
+            'user_id': '?',
+            '_id': {'$in': ['?']},
+            '$or': [{'title': '?'}, {'updated_at': {'$gte': '?'}}],
+        })
+
+    def test_explain_summary_flags_collection_scans(self):
+        summary = summarize_explain({
+            'queryPlanner': {'winningPlan': {'stage': 'SORT', 'inputStage': {'stage': 'COLLSCAN'}}},
+            'executionStats': {'totalDocsExamined': 5000, 'nReturned': 3},
+        })
+        self.assertTrue(summary['collscan'])
+        self.assertEqual(summary['plan'], ['SORT', 'COLLSCAN'])
+        self.assertEqual(summary['docs_examined'], 5000)
+
+
+class SearchTests(SimpleTestCase):
+    def test_tokenize_stems_and_drops_stopwords(self):
+        self.assertEqual(tokenize('Reviewing the Reports for Q3'), ['review', 'report', 'q3'])
+
+    def test_highlight_offsets_point_at_matches(self):
+        text = 'Send reports to the team'
+        result = highlight(text, tokenize('report'))
+        self.assertEqual([text[s:e] for s, e in result['matches']], ['reports'])
+
+    def test_cursor_round_trip(self):
+        self.assertEqual(decode_cursor(encode_cursor(1.25, 'abc')), (1.25, 'abc'))
+        with self.assertRaises(ValueError):
+            decode_cursor('not-a-cursor')
+
+    def test_index_ranks_title_matches_first_and_tracks_removals(self):
+        index = UserIndex([
+            {'id': 'a', 'title': 'Groceries', 'description': 'budget for the week'},
+            {'id': 'b', 'title': 'Budget review', 'description': ''},
+        ])
+        self.assertEqual([task_id for _, task_id in index.search(tokenize('budget'))], ['b', 'a'])
+        index.remove('b')
+        self.assertEqual([task_id for _, task_id in index.search(tokenize('budget'))], ['a'])
+        self.assertNotIn('review', index.postings)
+
+    def test_search_is_consistent_while_signals_mutate_the_index(self):
+        indexes = MemorySearchIndex()
+        task = {'id': 'b', 'user_id': 'user-1', 'title': 'Budget review', 'description': ''}
+        loader = lambda user_id: [{'id': 'a', 'user_id': user_id, 'title': 'Budget', 'description': ''}]
+        indexes.search('user-1', ['budget'], loader)
+        stop = threading.Event()
+
+        def churn():
+            while not stop.is_set():
+                indexes._on_task_saved(None, task)
+                indexes._on_task_deleted(None, 'b', 'user-1')
+
+        thread = threading.Thread(target=churn)
+        thread.start()
+        try:
+            for _ in range(2000):
+                hits = indexes.search('user-1', ['budget'], loader)
+                self.assertIn('a', [hit['id'] for _, hit in hits])
+        finally:
+            stop.set()
+            thread.join()
+
+
+    @override_settings(TASK_SEARCH={'BACKEND': 'Mongo'})
+    def test_unknown_backend_is_a_configuration_error(self):
+        with self.assertRaisesMessage(ImproperlyConfigured, "not 'Mongo'"):
+            task_service.search_tasks('user-1', 'budget')
+
+
+class SingleFlightTests(SimpleTestCase):
+    def _start_leader(self, flight, key):
+        """Begin a call for ``key`` that blocks until the returned event is set"""
+        release = threading.Event()
+        runs = []
+
+        def query():
+            runs.append(1)
+            release.wait(5)
+            return ['task']
+
+        leader = threading.Thread(target=flight.do, args=(key, query))
+        leader.start()
+        while not flight.snapshot()['in_flight']:
+            time.sleep(0.001)
+        return leader, release, runs
+
+    def test_concurrent_identical_calls_share_one_query(self):
+        flight = SingleFlight()
+        leader, release, runs = self._start_leader(flight, ('u1', 'list'))
+        results = []
+        followers = [
+            threading.Thread(target=lambda: results.append(flight.do(('u1', 'list'), lambda: ['other'])))
+            for _ in range(5)
+        ]
+        for follower in followers:
+            follower.start()
+        while flight.snapshot()['shared'] < 5:
+            time.sleep(0.001)
+        release.set()
+        for thread in [leader] + followers:
+            thread.join()
+
+        self.assertEqual(len(runs), 1)
+        self.assertEqual(results, [['task']] * 5)
+        self.assertEqual(flight.snapshot()['executed'], 1)
+
+    def test_write_invalidates_in_flight_call(self):
+        flight = SingleFlight()
+        leader, release, _ = self._start_leader(flight, ('u1', 'list'))
+        flight.forget('u1')
+        self.assertEqual(flight.do(('u1', 'list'), lambda: ['fresh']), ['fresh'])
+        release.set()
+        leader.join()
+        self.assertEqual(flight.snapshot()['invalidated'], 1)
+
+    def test_failed_call_is_not_kept(self):
+        flight = SingleFlight()
+        with self.assertRaises(ZeroDivisionError):
+            flight.do(('u1', 'list'), lambda: 1 / 0)
+        self.assertEqual(flight.snapshot()['in_flight'], 0)
+
+
+class IdempotencyTests(SimpleTestCase):
+    def _fingerprint(self, body):
+        request = APIRequestFactory().post('/api/tasks/', body, format='json')
+        return request_fingerprint(Request(request, parsers=[JSONParser()]))
+
+    def test_fingerprint_ignores_key_order_but_not_values(self):
+        self.assertEqual(
+            self._fingerprint({'title': 'a', 'tags': ['x']}),
+            self._fingerprint({'tags': ['x'], 'title': 'a'}),
+        )
+        self.assertNotEqual(self._fingerprint({'title': 'a'}), self._fingerprint({'title': 'b'}))
+
+    def test_oversized_key_is_rejected_before_any_write(self):
+        response = _api(
+            TaskListCreateView, 'post', '/api/tasks/', {'title': 'a'},
+            headers={'HTTP_IDEMPOTENCY_KEY': 'k' * 256},
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class FakeKeyCollection:
+    """Just enough of idempotency_keys for IdempotencyStore, with a unique _id"""
+
+    def __init__(self):
+        self.docs = {}
+        self.lock = threading.Lock()
+
+    def insert_one(self, doc):
+        from pymongo.errors import DuplicateKeyError
+        with self.lock:
+            if doc['_id'] in self.docs:
+                raise DuplicateKeyError('duplicate _id')
+            self.docs[doc['_id']] = dict(doc)
+
+    def find_one(self, query, projection=None, **kwargs):
+        with self.lock:
+            doc = self.docs.get(query['_id'])
+            return dict(doc) if doc else None
+
+    def find_one_and_update(self, query, update, **kwargs):
+        with self.lock:
+            doc = self.docs.get(query['_id'])
+            if doc is None or not all(
+                doc.get(field) < value['$lt'] if isinstance(value, dict) else doc.get(field) == value
+                for field, value in query.items()
+            ):
+                return None
+            doc.update(update['$set'])
+            return dict(doc)
+
+    update_one = find_one_and_update
+
+
+@override_settings(IDEMPOTENCY_KEYS={'POLL_INTERVAL': 0.01})
+class IdempotentCreateTests(SimpleTestCase):
+    def setUp(self):
+        patcher = mock.patch.object(
+            IdempotencyStore, 'collection', new_callable=mock.PropertyMock, return_value=FakeKeyCollection()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _post(self, responses=None):
+        response = _api(
+            TaskListCreateView, 'post', '/api/tasks/', {'title': 'a'}, headers={'HTTP_IDEMPOTENCY_KEY': 'key-1'}
+        )
+        if responses is not None:
+            responses.append(response)
+        return response
+
+    def test_concurrent_duplicates_insert_once_and_replay(self):
+        def create(*args, task_id=None):
+            time.sleep(0.2)  # still running when the duplicate arrives
+            return {'id': task_id, 'title': 'a'}
+
+        responses = []
+        with mock.patch.object(task_service, 'create_task', side_effect=create) as create_task:
+            threads = [threading.Thread(target=self._post, args=(responses,)) for _ in range(2)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+
+        create_task.assert_called_once()
+        self.assertEqual([r.status_code for r in responses], [201, 201])
+        self.assertEqual(sorted(str(r.get('Idempotent-Replayed')) for r in responses), ['None', 'true'])
+        self.assertEqual(responses[0].data['id'], responses[1].data['id'])
+
+    def test_retry_after_failure_reuses_the_reserved_id(self):
+        with mock.patch.object(
+            task_service, 'create_task', side_effect=[RuntimeError('boom'), {'id': 'x', 'title': 'a'}]
+        ) as create_task:
+            self.assertEqual(self._post().status_code, 500)
+            self.assertEqual(self._post().status_code, 201)
+
+        first, retry = create_task.call_args_list
+        self.assertIsNotNone(first.kwargs['task_id'])
+        self.assertEqual(first.kwargs['task_id'], retry.kwargs['task_id'])
+
+    def test_job_retry_after_a_lost_insert_reuses_the_reserved_id(self):
+        from pymongo.errors import AutoReconnect
+
+        class LostReplyCollection(FakeKeyCollection):
+            def insert_one(self, doc):
+                super().insert_one(doc)
+                if len(self.docs) == 1:
+                    raise AutoReconnect('socket timed out after the write committed')
+
+        jobs = LostReplyCollection()
+        self.addCleanup(mongodb_breaker.reset)
+        with mock.patch.object(JobQueue, 'collection', new_callable=mock.PropertyMock, return_value=jobs):
+            statuses = []
+            for _ in range(2):
+                response = _api(
+                    JobListCreateView, 'post', '/api/jobs/', {'type': 'tasks.export'},
+                    headers={'HTTP_IDEMPOTENCY_KEY': 'key-1'},
+                )
+                statuses.append(response.status_code)
+
+        self.assertEqual(statuses, [503, 202])
+        self.assertEqual(list(jobs.docs), [ObjectId(response.data['id'])])
+
+
+class JobValidationTests(SimpleTestCase):
+    def test_import_fixes_task_ids_at_enqueue_time(self):
+        params = ImportJob().validate({'tasks': [{'title': ' a '}, {'title': 'b', 'completed': True}]})
+        self.assertEqual([t['title'] for t in params['tasks']], ['a', 'b'])
+        self.assertEqual([t['completed'] for t in params['tasks']], [False, True])
+        self.assertEqual(len({t['id'] for t in params['tasks']}), 2)
+
+    def test_import_rejects_values_it_would_have_to_coerce(self):
+        for item in (
+            {'description': 'no title'},
+            {'title': 1},
+            {'title': 'a', 'description': ['x']},
+            {'title': 'a', 'completed': 1},
+            {'title': 'a', 'completed': 'false'},
+        ):
+            with self.assertRaises(ValueError, msg=item):
+                ImportJob().validate({'tasks': [item]})
+
+    def test_bulk_delete_needs_ids_or_completed(self):
+        self.assertEqual(BulkDeleteJob().validate({'completed': True}), {'completed': True})
+        with self.assertRaises(ValueError):
+            BulkDeleteJob().validate({})
+        with self.assertRaises(ValueError):
+            BulkDeleteJob().validate({'ids': 'abc'})
+
+
+@override_settings(BACKGROUND_JOBS={'MAX_ATTEMPTS': 3, 'EXPORT_MAX_BYTES': 300})
+class JobQueueTests(SimpleTestCase):
+    def test_expired_leases_are_reclaimed_only_while_attempts_remain(self):
+        collection = mock.MagicMock()
+        collection.find_one_and_update.return_value = None
+        with mock.patch.object(JobQueue, 'collection', new_callable=mock.PropertyMock, return_value=collection):
+            self.assertIsNone(JobQueue().claim('worker-1'))
+
+        [exhausted, update], _ = collection.update_many.call_args
+        self.assertEqual(exhausted['attempts'], {'$gte': 3})
+        self.assertEqual(update['$set']['state'], 'failed')
+        [query, _], _ = collection.find_one_and_update.call_args
+        self.assertIn({'state': 'running', 'lease_until': mock.ANY, 'attempts': {'$lt': 3}}, query['$or'])
+
+    def test_export_stops_at_the_size_cap(self):
+        tasks = [{'id': str(i), 'title': 't', 'description': 'x' * 100} for i in range(5)]
+        job = mock.MagicMock(user_id='user-1')
+        with mock.patch.object(task_service, 'get_tasks_by_user', return_value=tasks):
+            result = ExportJob().run(job)
+        self.assertEqual((result['count'], result['total'], result['truncated']), (2, 5, True))
+        self.assertEqual(result['tasks'], tasks[:2])
+
+
+class AnalyticsViewTests(SimpleTestCase):
+    def _get(self, query):
+        return _api(TaskAnalyticsView, 'get', f'/api/tasks/analytics/?{query}')
+
+    def test_bad_ranges_are_rejected_before_querying(self):
+        for query in ('range=month', 'range=0d', 'range=60w', 'range=7d&group=year'):
+            self.assertEqual(self._get(query).status_code, 400, query)
+
+
+class RollupRebuildTests(SimpleTestCase):
+    def test_rebuild_applies_deltas_and_drops_only_days_still_empty(self):
+        from pymongo import UpdateOne
+        from .analytics import TaskRollups
+
+        old, yesterday, today = datetime(2020, 1, 1), datetime(2026, 10, 18), datetime(2026, 10, 19)
+        rollups = mock.MagicMock()
+        rollups.find.return_value = [
+            {'_id': 'today', 'user_id': 'user-1', 'day': today, 'created': 1, 'completed': 1},
+            {'_id': 'old', 'user_id': 'user-1', 'day': old, 'created': 3},
+        ]
+        tasks = mock.MagicMock()
+        tasks.aggregate.side_effect = [
+            [{'_id': {'user_id': 'user-1', 'day': day}, 'count': 2} for day in (yesterday, today)],
+            [{'_id': {'user_id': 'user-1', 'day': today}, 'count': 1}],
+        ]
+        with mock.patch.object(TaskRollups, 'collection', new_callable=mock.PropertyMock, return_value=rollups), \
+                mock.patch.object(type(mongodb_service), 'tasks_collection',
+                                  new_callable=mock.PropertyMock, return_value=tasks):
+            self.assertEqual(TaskRollups().rebuild('user-1'), 3)
+
+        [requests], _ = rollups.bulk_write.call_args
+        self.assertEqual(requests, [
+            UpdateOne({'user_id': 'user-1', 'day': day}, {'$inc': delta}, upsert=True)
+            for day, delta in ((old, {'created': -3}), (yesterday, {'created': 2}), (today, {'created': 1}))
+        ])
+        rollups.delete_many.assert_called_once_with(
+            {'_id': {'$in': ['old']}, 'created': {'$in': [0, None]}, 'completed': {'$in': [0, None]}}
+        )
+        rollups.replace_one.assert_not_called()
+
+FAST_FAILING = {
+    'FAILURE_THRESHOLD': 2,
+    'RESET_TIMEOUT': 30.0,
+    'READ_RETRIES': 1,
+    'RETRY_BACKOFF': 0.01,
+    'READ_DEADLINE': 5.0,
+    'WRITE_DEADLINE': 5.0,
+}
+
+
+@override_settings(MONGODB_RESILIENCE=FAST_FAILING)
+class UnreachableMongoTests(SimpleTestCase):
+    """Fault injection: point the services at a server that never answers"""
+
+    def setUp(self):
+        from pymongo import MongoClient
+
+        self.client = MongoClient(
+            'mongodb://127.0.0.1:1/', serverSelectionTimeoutMS=100, connect=False
+        )
+        self.saved = (mongodb_service._client, mongodb_service._db)
+        mongodb_service._client = self.client
+        mongodb_service._db = self.client['taskflow_unreachable']
+        mongodb_breaker.reset()
+
+    def tearDown(self):
+        mongodb_service._client, mongodb_service._db = self.saved
+        self.client.close()
+        mongodb_breaker.reset()
+
+    def test_reads_retry_then_open_the_breaker(self):
+        with self.assertRaises(DatabaseUnavailable):
+            task_service.get_tasks_by_user('user-1')
+        snapshot = mongodb_breaker.snapshot()
+        self.assertEqual(snapshot['state'], CircuitBreaker.OPEN)
+        self.assertEqual(snapshot['failures'], 2)
+
+    def test_open_breaker_fails_fast(self):
+        with self.assertRaises(DatabaseUnavailable):
+            task_service.get_tasks_by_user('user-1')
+
+        start = time.monotonic()
+        with self.assertRaises(DatabaseUnavailable) as ctx:
+            task_service.get_task_by_id('0' * 24, 'user-1')
+        self.assertLess(time.monotonic() - start, 0.05)
+        self.assertGreater(ctx.exception.wait, 1)
+        self.assertEqual(mongodb_breaker.snapshot()['rejected'], 1)
+
+    def test_writes_are_not_retried(self):
+        with self.assertRaises(DatabaseUnavailable):
+            task_service.create_task('title', '', 'user-1')
+        snapshot = mongodb_breaker.snapshot()
+        self.assertEqual(snapshot['failures'], 1)
+        self.assertEqual(snapshot['state'], CircuitBreaker.CLOSED)
+
+    def test_view_returns_503_with_retry_after(self):
+        response = _api(TaskListCreateView, 'get', '/api/tasks/')
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+
+
+@override_settings(MONGODB_RESILIENCE={**FAST_FAILING, 'RESET_TIMEOUT': 0})
+class CircuitBreakerTests(SimpleTestCase):
+    def test_half_open_allows_a_single_trial(self):
+        breaker = CircuitBreaker('test')
+        self.addCleanup(BREAKERS.pop, 'test')
+        breaker.record_failure()
+        breaker.record_failure()
+        self.assertEqual(breaker.state, CircuitBreaker.OPEN)
+
+        breaker.before_call()  # trial call
+        self.assertEqual(breaker.state, CircuitBreaker.HALF_OPEN)
+        with self.assertRaises(DatabaseUnavailable):
+            breaker.before_call()
+
+        breaker.record_success()
+        self.assertEqual(breaker.state, CircuitBreaker.CLOSED)
+
+
+@override_settings(MONGODB_RESILIENCE={**FAST_FAILING, 'READ_DEADLINE': 2.0})
+class DeadlineTests(SimpleTestCase):
+    def test_remaining_ms_follows_the_guarded_deadline(self):
+        seen = []
+
+        @guarded('test.slow_read', idempotent=True)
+        def read():
+            seen.append(remaining_ms())
+            time.sleep(0.05)
+            seen.append(remaining_ms())
+
+        read()
+        self.assertTrue(1950 <= seen[0] <= 2000)
+        self.assertLess(seen[1], seen[0] - 40)
+        self.assertEqual(remaining_ms(), 2000)  # outside a guarded call
+
+    def test_reads_pass_the_deadline_as_max_time_ms(self):
+        collection = mock.MagicMock()
+        collection.find_one.return_value = None
+        with _patch_tasks_collection(collection):
+            task_service.get_task_by_id('0' * 24, 'user-1')
+        self.assertTrue(0 < collection.find_one.call_args.kwargs['max_time_ms'] <= 2000)
+
+
+class BrowserOnlyMiddlewareTests(TestCase):
+    def test_admin_keeps_csrf_and_sessions(self):
+        client = Client(enforce_csrf_checks=True)
+        response = client.get('/admin/login/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('csrftoken', response.cookies)
+
+        response = client.post('/admin/login/', {'username': 'x', 'password': 'y'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_api_skips_browser_middleware(self):
+        response = self.client.get('/api/health/')
+        self.assertNotIn('csrftoken', response.cookies)
+        self.assertNotIn('Cookie', response.get('Vary', ''))
@@ -1,6 +1,6 @@
 from django.urls import path
 from rest_framework_simplejwt.views import TokenRefreshView
-from .views import TaskListCreateView, TaskDetailView, UserRegistrationView, UserLoginView
+from .views import HealthView, TaskListCreateView, TagListView, TaskChangesView, TaskLookupView, TaskSearchView, TaskAnalyticsView, TaskDetailView, TaskMoveView, TaskTagsView, JobListCreateView, JobDetailView, UserRegistrationView, UserLoginView
 
 urlpatterns = [
     # Authentication endpoints
@@ -8,7 +8,21 @@ urlpatterns = [
     path('auth/login/', UserLoginView.as_view(), name='user-login'),
     path('auth/refresh/', TokenRefreshView.as_view(), name='token-refresh'),
     
+    # Health check (breaker state)
+    path('health/', HealthView.as_view(), name='health'),
+    
     # Task endpoints (authentication required)
     path('tasks/', TaskListCreateView.as_view(), name='task-list-create'),
+    path('tasks/tags/', TagListView.as_view(), name='task-tags'),
+    path('tasks/changes/', TaskChangesView.as_view(), name='task-changes'),
+    path('tasks/lookup/', TaskLookupView.as_view(), name='task-lookup'),
+    path('tasks/search/', TaskSearchView.as_view(), name='task-search'),
+    path('tasks/analytics/', TaskAnalyticsView.as_view(), name='task-analytics'),
     path('tasks/<str:pk>/', TaskDetailView.as_view(), name='task-detail'),
+    path('tasks/<str:pk>/move/', TaskMoveView.as_view(), name='task-move'),
+    path('tasks/<str:pk>/tags/', TaskTagsView.as_view(), name='task-tag-update'),
+    
+    # Background jobs (run by `manage.py run_workers`)
+    path('jobs/', JobListCreateView.as_view(), name='job-list-create'),
+    path('jobs/<str:pk>/', JobDetailView.as_view(), name='job-detail'),
 ]
\ No newline at end of file
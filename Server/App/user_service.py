@@ -8,18 +8,21 @@ import hashlib
 from datetime import datetime
 from typing import Dict, Optional
 from bson import ObjectId
-from pymongo import MongoClient
 from django.conf import settings
 import logging
 
+from .resilience import guarded, is_transient, remaining_ms
+
 logger = logging.getLogger(__name__)
 
 class UserService:
     """Service class for User operations in MongoDB"""
-    
-    def __init__(self):
+
+    @property
+    def collection(self):
+        """Users collection, resolved on first use"""
         from .mongodb_service import mongodb_service
-        self.collection = mongodb_service.db.users
+        return mongodb_service.db.users
 
     def hash_password(self, password: str) -> str:
         """Hash password using SHA256"""
@@ -29,13 +32,14 @@ class UserService:
         """Verify password against hash"""
         return self.hash_password(password) == hashed_password
 
+    @guarded('users.create_user')
     def create_user(self, username: str, email: str, password: str) -> Dict:
         """Create a new user"""
         # Check if user already exists
-        if self.collection.find_one({'username': username}):
+        if self.collection.find_one({'username': username}, max_time_ms=remaining_ms()):
             raise ValueError("Username already exists")
         
-        if self.collection.find_one({'email': email}):
+        if self.collection.find_one({'email': email}, max_time_ms=remaining_ms()):
             raise ValueError("Email already exists")
         
         user_data = {
@@ -53,9 +57,10 @@ class UserService:
         
         return self._format_user(user_data)
 
+    @guarded('users.authenticate_user')
     def authenticate_user(self, username: str, password: str) -> Optional[Dict]:
         """Authenticate user with username and password"""
-        user = self.collection.find_one({'username': username})
+        user = self.collection.find_one({'username': username}, max_time_ms=remaining_ms())
         
         if user and self.verify_password(password, user['password']):
             # Update last login
@@ -67,21 +72,26 @@ class UserService:
         
         return None
 
+    @guarded('users.get_user_by_id', idempotent=True)
     def get_user_by_id(self, user_id: str) -> Optional[Dict]:
         """Get user by ID"""
         try:
             object_id = ObjectId(user_id)
-            user = self.collection.find_one({'_id': object_id})
+            user = self.collection.find_one({'_id': object_id}, max_time_ms=remaining_ms())
             return self._format_user(user) if user else None
         except Exception as e:
+            if is_transient(e):
+                raise
             logger.error(f"Error getting user {user_id}: {e}")
             return None
 
+    @guarded('users.get_user_by_username', idempotent=True)
     def get_user_by_username(self, username: str) -> Optional[Dict]:
         """Get user by username"""
-        user = self.collection.find_one({'username': username})
+        user = self.collection.find_one({'username': username}, max_time_ms=remaining_ms())
         return self._format_user(user) if user else None
 
+    @guarded('users.update_user')
     def update_user(self, user_id: str, update_data: Dict) -> Optional[Dict]:
         """Update user data"""
         try:
@@ -101,6 +111,8 @@ class UserService:
             return None
             
         except Exception as e:
+            if is_transient(e):
+                raise
             logger.error(f"Error updating user {user_id}: {e}")
             return None
 
@@ -118,5 +130,5 @@ class UserService:
             'last_login': user['last_login'].isoformat() if user.get('last_login') else None,
         }
 
-# Global user service instance
+# Global user service instance (no database access until first call)
 user_service = UserService()
\ No newline at end of file
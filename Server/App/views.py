@@ -1,11 +1,17 @@
+import re
+
 from rest_framework import generics, status, permissions
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
-from .mongodb_service import task_service
+from django.core.exceptions import ImproperlyConfigured
+from .mongodb_service import task_service, SyncTokenExpired
 from .user_service import user_service
 from .auth_backend import MongoDBAuthBackend
+from .resilience import DatabaseUnavailable, BREAKERS
+from .idempotency import idempotent
+from .jobs import job_queue
 
 # Simple user registration serializer
 from rest_framework import serializers
@@ -45,6 +51,8 @@ class UserRegistrationView(APIView):
                     'message': 'User registered successfully',
                     'user': user_data
                 }, status=status.HTTP_201_CREATED)
+            except DatabaseUnavailable:
+                raise
             except Exception as e:
                 return Response({
                     'error': str(e)
@@ -83,45 +91,234 @@ class UserLoginView(APIView):
         
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+class HealthView(APIView):
+    authentication_classes = []
+    permission_classes = [permissions.AllowAny]
+    
+    def get(self, request):
+        """Report circuit breaker state and read coalescing counters; 503 while any breaker is not closed"""
+        breakers = {name: breaker.snapshot() for name, breaker in BREAKERS.items()}
+        healthy = all(b['state'] == 'closed' for b in breakers.values())
+        return Response(
+            {
+                'status': 'ok' if healthy else 'degraded',
+                'breakers': breakers,
+                'read_coalescing': task_service.reads.snapshot(),
+            },
+            status=status.HTTP_200_OK if healthy else status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
 class TaskListCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        """Get all tasks for the authenticated user"""
+        """Get all tasks for the authenticated user, or only ?ids=a,b,c
+
+        Tag filters: ?tag=x (has tag x), ?tags_all=x,y (has all of x and y)
+        """
         try:
+            if 'ids' in request.query_params:
+                task_ids = [i for i in request.query_params['ids'].split(',') if i]
+                tasks = task_service.get_tasks_by_ids(task_ids, request.user.id)
+                return Response(tasks, status=status.HTTP_200_OK)
+
+            tags_all = [t.strip() for t in request.query_params.get('tags_all', '').split(',') if t.strip()]
+
             # Use MongoDB user ID (string format)
-            tasks = task_service.get_tasks_by_user(request.user.id)
+            tasks = task_service.get_tasks_by_user(
+                request.user.id,
+                tag=request.query_params.get('tag', '').strip() or None,
+                tags_all=tags_all,
+            )
             return Response(tasks, status=status.HTTP_200_OK)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             return Response(
                 {'error': 'Failed to fetch tasks'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
     
+    @idempotent
     def post(self, request):
-        """Create a new task for the authenticated user"""
+        """Create a new task for the authenticated user (retry-safe with an Idempotency-Key header)"""
         try:
             title = request.data.get('title', '').strip()
             description = request.data.get('description', '').strip()
             completed = request.data.get('completed', False)
+            tags = request.data.get('tags', [])
+            due_at = request.data.get('due_at')
             
             if not title:
                 return Response(
                     {'error': 'Title is required'}, 
                     status=status.HTTP_400_BAD_REQUEST
                 )
+            if not isinstance(completed, bool):
+                return Response(
+                    {'error': 'completed must be true or false'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
             
             # Use MongoDB user ID (string format)
-            task = task_service.create_task(title, description, request.user.id, completed)
+            task = task_service.create_task(
+                title, description, request.user.id, completed, tags, due_at,
+                task_id=getattr(request, 'idempotent_object_id', None),
+            )
             
             return Response(task, status=status.HTTP_201_CREATED)
             
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             return Response(
                 {'error': 'Failed to create task'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
 
+class TagListView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        """Get the user's tags with task counts"""
+        try:
+            tags = task_service.get_tag_counts(request.user.id)
+            return Response(tags, status=status.HTTP_200_OK)
+        except DatabaseUnavailable:
+            raise
+        except Exception as e:
+            return Response(
+                {'error': 'Failed to fetch tags'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class TaskChangesView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        """Get tasks changed and ids deleted since ?since=<token> (omit for a full sync)"""
+        try:
+            changes = task_service.get_changes(request.user.id, request.query_params.get('since'))
+            return Response(changes, status=status.HTTP_200_OK)
+        except SyncTokenExpired as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_410_GONE
+            )
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except DatabaseUnavailable:
+            raise
+        except Exception as e:
+            return Response(
+                {'error': 'Failed to fetch changes'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class TaskLookupView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request):
+        """Get the tasks listed in {'ids': [...]} (for lists too long for a query string)"""
+        task_ids = request.data.get('ids')
+        if not isinstance(task_ids, list) or not all(isinstance(i, str) for i in task_ids):
+            return Response(
+                {'error': 'ids must be a list of task ids'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            tasks = task_service.get_tasks_by_ids(task_ids, request.user.id)
+            return Response(tasks, status=status.HTTP_200_OK)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except DatabaseUnavailable:
+            raise
+        except Exception as e:
+            return Response(
+                {'error': 'Failed to fetch tasks'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class TaskSearchView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        """Search task titles and descriptions: ?q=...&limit=20&cursor=<next_cursor>"""
+        try:
+            limit = int(request.query_params.get('limit', 20))
+        except ValueError:
+            return Response(
+                {'error': 'limit must be an integer'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        try:
+            results = task_service.search_tasks(
+                request.user.id,
+                request.query_params.get('q', ''),
+                limit=limit,
+                cursor=request.query_params.get('cursor') or None,
+            )
+            return Response(results, status=status.HTTP_200_OK)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except (DatabaseUnavailable, ImproperlyConfigured):
+            raise
+        except Exception as e:
+            return Response(
+                {'error': 'Failed to search tasks'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class TaskAnalyticsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        """Tasks created/completed per period: ?range=30d (or 12w) &group=day|week"""
+        value = request.query_params.get('range', '30d').strip().lower()
+        match = re.fullmatch(r'(\d+)([dw])', value)
+        if not match:
+            return Response(
+                {'error': 'range must look like 30d or 12w'}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        days = int(match.group(1)) * (7 if match.group(2) == 'w' else 1)
+        try:
+            analytics = task_service.get_analytics(
+                request.user.id, days, request.query_params.get('group', 'day')
+            )
+            return Response(analytics, status=status.HTTP_200_OK)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except DatabaseUnavailable:
+            raise
+        except Exception as e:
+            return Response(
+                {'error': 'Failed to fetch analytics'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
 class TaskDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
@@ -135,6 +332,8 @@ class TaskDetailView(APIView):
                     status=status.HTTP_404_NOT_FOUND
                 )
             return Response(task, status=status.HTTP_200_OK)
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             return Response(
                 {'error': 'Failed to fetch task'}, 
@@ -144,6 +343,12 @@ class TaskDetailView(APIView):
     def put(self, request, pk):
         """Update a specific task"""
         try:
+            if not isinstance(request.data.get('completed', False), bool):
+                return Response(
+                    {'error': 'completed must be true or false'}, 
+                    status=status.HTTP_400_BAD_REQUEST
+                )
+
             task = task_service.get_task_by_id(pk, request.user.id)
             if not task:
                 return Response(
@@ -159,6 +364,8 @@ class TaskDetailView(APIView):
                 update_data['description'] = request.data['description'].strip()
             if 'completed' in request.data:
                 update_data['completed'] = request.data['completed']
+            if 'due_at' in request.data:
+                update_data['due_at'] = request.data['due_at']
             
             if not update_data:
                 return Response(task, status=status.HTTP_200_OK)
@@ -172,6 +379,13 @@ class TaskDetailView(APIView):
                     status=status.HTTP_400_BAD_REQUEST
                 )
                 
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             return Response(
                 {'error': 'Failed to update task'}, 
@@ -189,8 +403,137 @@ class TaskDetailView(APIView):
                     {'error': 'Task not found'}, 
                     status=status.HTTP_404_NOT_FOUND
                 )
+        except DatabaseUnavailable:
+            raise
         except Exception as e:
             return Response(
                 {'error': 'Failed to delete task'}, 
                 status=status.HTTP_500_INTERNAL_SERVER_ERROR
             )
+
+class TaskMoveView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request, pk):
+        """Move a task between its new neighbours ('before' above, 'after' below)"""
+        try:
+            task = task_service.move_task(
+                pk,
+                request.user.id,
+                before_id=request.data.get('before') or None,
+                after_id=request.data.get('after') or None,
+            )
+            if not task:
+                return Response(
+                    {'error': 'Task not found'}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(task, status=status.HTTP_200_OK)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except DatabaseUnavailable:
+            raise
+        except Exception as e:
+            return Response(
+                {'error': 'Failed to move task'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class TaskTagsView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def post(self, request, pk):
+        """Add and/or remove tags: {'add': [...], 'remove': [...]}"""
+        try:
+            task = task_service.update_tags(
+                pk,
+                request.user.id,
+                add=request.data.get('add', []),
+                remove=request.data.get('remove', []),
+            )
+            if not task:
+                return Response(
+                    {'error': 'Task not found'}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(task, status=status.HTTP_200_OK)
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except DatabaseUnavailable:
+            raise
+        except Exception as e:
+            return Response(
+                {'error': 'Failed to update tags'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class JobListCreateView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request):
+        """The user's most recent background jobs"""
+        try:
+            jobs = job_queue.get_jobs_by_user(request.user.id)
+            return Response(jobs, status=status.HTTP_200_OK)
+        except DatabaseUnavailable:
+            raise
+        except Exception as e:
+            return Response(
+                {'error': 'Failed to fetch jobs'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+    
+    @idempotent
+    def post(self, request):
+        """Queue a background job: {'type': 'tasks.export', 'params': {...}}; poll /api/jobs/<id>/"""
+        try:
+            job = job_queue.enqueue(
+                request.data.get('type', ''),
+                request.user.id,
+                request.data.get('params') or {},
+                job_id=getattr(request, 'idempotent_object_id', None),
+            )
+            return Response(
+                job,
+                status=status.HTTP_202_ACCEPTED,
+                headers={'Location': f"/api/jobs/{job['id']}/"}
+            )
+        except ValueError as e:
+            return Response(
+                {'error': str(e)}, 
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        except DatabaseUnavailable:
+            raise
+        except Exception as e:
+            return Response(
+                {'error': 'Failed to queue job'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
+
+class JobDetailView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+    
+    def get(self, request, pk):
+        """Status, progress and (once finished) result of a background job"""
+        try:
+            job = job_queue.get_job(pk, request.user.id)
+            if not job:
+                return Response(
+                    {'error': 'Job not found'}, 
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            return Response(job, status=status.HTTP_200_OK)
+        except DatabaseUnavailable:
+            raise
+        except Exception as e:
+            return Response(
+                {'error': 'Failed to fetch job'}, 
+                status=status.HTTP_500_INTERNAL_SERVER_ERROR
+            )
@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Project.settings')
 
 application = get_asgi_application()
+
+from App.reminders import start_reminder_scheduler  # noqa: E402 (needs apps loaded)
+
+start_reminder_scheduler()
@@ -2,6 +2,7 @@ from pathlib import Path
 import os
 from dotenv import load_dotenv
 from datetime import timedelta
+from corsheaders.defaults import default_headers
 
 # Load environment variables
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -29,15 +30,28 @@ INSTALLED_APPS = [
 # Middleware stack
 MIDDLEWARE = [
     'corsheaders.middleware.CorsMiddleware',
+    'App.middleware.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'App.middleware.BrowserOnlyMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+# Session/CSRF/auth/messages middleware, run by BrowserOnlyMiddleware for
+# everything outside API_PATH_PREFIX (i.e. the admin). API requests use JWT
+# and skip them.
+API_PATH_PREFIX = '/api/'
+BROWSER_MIDDLEWARE = [
+    'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
-    'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# The admin checks look for these middleware in MIDDLEWARE directly; they are
+# installed through BROWSER_MIDDLEWARE instead.
+SILENCED_SYSTEM_CHECKS = ['admin.E408', 'admin.E409', 'admin.E410']
+
 # URL & templates
 ROOT_URLCONF = 'Project.urls'
 TEMPLATES = [
@@ -71,8 +85,81 @@ MONGODB_SETTINGS = {
     'DB_NAME': os.environ.get('MONGODB_DB_NAME'),
     'USERNAME': os.environ.get('MONGODB_USERNAME'),
     'PASSWORD': os.environ.get('MONGODB_PASSWORD'),
+    # Per-attempt driver timeouts (PyMongo's server selection default is 30s).
+    # Reads also carry maxTimeMS from the resilience deadline; the socket
+    # timeout stays just above READ_DEADLINE/WRITE_DEADLINE as a backstop
+    # for plain writes and hung connections.
+    'SERVER_SELECTION_TIMEOUT_MS': int(os.environ.get('MONGODB_SERVER_SELECTION_TIMEOUT_MS', '3000')),
+    'CONNECT_TIMEOUT_MS': int(os.environ.get('MONGODB_CONNECT_TIMEOUT_MS', '3000')),
+    'SOCKET_TIMEOUT_MS': int(os.environ.get('MONGODB_SOCKET_TIMEOUT_MS', '6000')),
+}
+
+# Circuit breaker and retry policy for MongoDB calls (see App/resilience.py)
+MONGODB_RESILIENCE = {
+    'FAILURE_THRESHOLD': int(os.environ.get('MONGODB_BREAKER_FAILURE_THRESHOLD', '5')),
+    'RESET_TIMEOUT': float(os.environ.get('MONGODB_BREAKER_RESET_TIMEOUT', '30')),
+    'READ_RETRIES': 2,
+    'RETRY_BACKOFF': 0.1,
+    'READ_DEADLINE': 5.0,
+    'WRITE_DEADLINE': 5.0,
+}
+
+# Slow MongoDB command log (see App/slow_queries.py and `manage.py slow_queries`)
+SLOW_QUERY_LOG = {
+    'ENABLED': os.environ.get('SLOW_QUERY_LOG_ENABLED', 'true').lower() == 'true',
+    'THRESHOLD_MS': float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '100')),
+    'EXPLAIN_SAMPLE_RATE': float(os.environ.get('SLOW_QUERY_EXPLAIN_SAMPLE_RATE', '0.1')),
+    'COLLECTION': 'slow_queries',
+    'COLLECTION_SIZE_BYTES': 16 * 1024 * 1024,
 }
 
+# Due-date reminders (see App/reminders.py); the scheduler runs inside each
+# web worker, and reminders are claimed in MongoDB so each is sent at most once
+TASK_REMINDERS = {
+    'ENABLED': os.environ.get('TASK_REMINDERS_ENABLED', 'false').lower() == 'true',
+    'SINK': os.environ.get('TASK_REMINDER_SINK', 'App.reminders.LogReminderSink'),
+    'WINDOW_SECONDS': int(os.environ.get('TASK_REMINDER_WINDOW_SECONDS', '3600')),
+    'BATCH_SIZE': 500,
+    'WEBHOOK_URL': os.environ.get('TASK_REMINDER_WEBHOOK_URL', ''),
+    'WEBHOOK_TIMEOUT': 5,
+}
+
+# Task search: 'mongo' uses the user_text index (created by ensure_indexes)
+# and falls back to 'memory', a per-process inverted index, when it is missing
+TASK_SEARCH = {
+    'BACKEND': os.environ.get('TASK_SEARCH_BACKEND', 'mongo'),
+    'MEMORY_MAX_USERS': 1000,
+    'MEMORY_INDEX_TTL': int(os.environ.get('TASK_SEARCH_MEMORY_INDEX_TTL', '60')),
+    'SNIPPET_LENGTH': 160,
+}
+
+# Idempotency-Key header on POST /api/tasks/ (see App/idempotency.py).
+# Changing TTL_SECONDS takes effect on the next ensure_indexes run (the TTL index is recreated).
+IDEMPOTENCY_KEYS = {
+    'TTL_SECONDS': int(os.environ.get('IDEMPOTENCY_KEY_TTL_SECONDS', str(24 * 3600))),
+    'PENDING_TIMEOUT': 30,
+    'WAIT_SECONDS': 5,
+    'POLL_INTERVAL': 0.05,
+}
+
+# Background jobs (see App/jobs.py), run by `manage.py run_workers`.
+# Changing RETENTION_SECONDS takes effect on the next ensure_indexes run (the TTL index is recreated).
+BACKGROUND_JOBS = {
+    'LEASE_SECONDS': 60,
+    'MAX_ATTEMPTS': 3,
+    'RETRY_DELAY_SECONDS': 30,
+    'POLL_INTERVAL': 1.0,
+    'WORKERS': int(os.environ.get('JOB_WORKERS', '2')),
+    'MODE': os.environ.get('JOB_WORKER_MODE', 'thread'),
+    'IMPORT_MAX_TASKS': 5000,
+    'EXPORT_MAX_BYTES': 8 * 1024 * 1024,
+    'RETENTION_SECONDS': int(os.environ.get('JOB_RETENTION_SECONDS', str(7 * 24 * 3600))),
+}
+
+# Deleted-task tombstones (for /api/tasks/changes/) expire after this long.
+# Changing it takes effect on the next ensure_indexes run (the TTL index is recreated).
+TASK_TOMBSTONE_TTL_SECONDS = int(os.environ.get('TASK_TOMBSTONE_TTL_SECONDS', str(30 * 24 * 3600)))
+
 # Password validators
 AUTH_PASSWORD_VALIDATORS = [
     {'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator'},
@@ -95,6 +182,8 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 CORS_ALLOW_ALL_ORIGINS = os.environ.get('CORS_ALLOW_ALL_ORIGINS', 'false').lower() == 'true'
 CORS_ALLOWED_ORIGINS = os.environ.get('CORS_ALLOWED_ORIGINS', '').split(',')
 CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+CORS_EXPOSE_HEADERS = ['Idempotent-Replayed', 'Retry-After']
 
 # Auth backends
 AUTHENTICATION_BACKENDS = [
@@ -112,9 +201,19 @@ REST_FRAMEWORK = {
     ],
     'DEFAULT_RENDERER_CLASSES': [
         'rest_framework.renderers.JSONRenderer',
+        'App.renderers.MessagePackRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'App.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
     ],
 }
 
+# Responses smaller than this are sent uncompressed
+RESPONSE_COMPRESSION_MIN_BYTES = int(os.environ.get('RESPONSE_COMPRESSION_MIN_BYTES', '1024'))
+
 # JWT config
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=60),
@@ -14,3 +14,7 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Project.settings')
 
 application = get_wsgi_application()
+
+from App.reminders import start_reminder_scheduler  # noqa: E402 (needs apps loaded)
+
+start_reminder_scheduler()